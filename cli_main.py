@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_folder = os.path.join(current_dir, 'src')
+sys.path.append(src_folder)
+
+import whisper_utils
+
+
+# Exit codes, for batch schedulers
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+# Every command imports its utils module only when it runs: gradio is never imported, and torch and whisper
+# only when a transcription is requested.
+
+def run_convert(args):
+    import analyze_utils
+
+    result = analyze_utils.convert_files(args.input, args.output, args.format, workers=args.workers)
+    return not result['failed'], '\n'.join(result['logs']), {'failed': result['failed'], 'metrics_path': result['metrics_path']}
+
+
+def without_pauses(analysis):
+    # The pauses kept to predict other thresholds are left out of the JSON output, they would make it huge
+    return {key: value for key, value in analysis.items() if key != 'split_pauses'}
+
+
+def run_analyze(args):
+    import analyze_utils
+
+    analyses = analyze_utils.analyze_files(args.files)
+    message = '\n\n'.join(analyze_utils.format_analysis(analysis) for analysis in analyses)
+    return True, message, {'analyses': [without_pauses(analysis) for analysis in analyses]}
+
+
+def run_analyze_folder(args):
+    import analyze_utils
+
+    try:
+        result = analyze_utils.analyze_folder(args.input, args.time_threshold, args.workers)
+    except ValueError as error:
+        return False, str(error), {}
+
+    analyses = {file: without_pauses(analysis) for file, analysis in result['analyses'].items()}
+    return not result['failed'], analyze_utils.format_folder_report(result), {'failed': result['failed'], 'cached': result['cached'], 'analyses': analyses}
+
+
+def run_split(args):
+    import conform_utils
+    import split_utils
+
+    conform = conform_utils.get_conform_settings(args.sample_rate, args.mono, args.loudness, args.peak)
+    try:
+        result = split_utils.split_files(args.input, args.time_threshold, args.output, args.transcribe, args.model,
+                                         args.silence_backend, args.split_mode, args.segmentation, args.workers, args.output_mode,
+                                         args.batch_size, args.max_wait, conform=conform)
+    except ValueError as error:
+        return False, str(error), {}
+
+    return not result['failed'], '\n'.join(result['logs']), {'failed': result['failed'], 'metrics_path': result['metrics_path']}
+
+
+def run_materialize(args):
+    import split_utils
+
+    result = split_utils.materialize_cut_indexes(args.input)
+    if not result['indexes']:
+        return False, f'No cut index found in {args.input} or its subfolders.', {'failed': []}
+
+    return not result['failed'], '\n'.join(result['logs']), {'indexes': result['indexes'], 'failed': result['failed'], 'clips': result['clips']}
+
+
+def run_transcribe(args):
+    import transcribe_utils
+
+    message = transcribe_utils.internal_transcriber(args.input, args.model, args.output)
+    return True, message, {'output': os.path.join(args.output, 'whisper.json')}
+
+
+def run_quality(args):
+    import quality_utils
+
+    result = quality_utils.measure_folder(args.input, args.workers)
+    return not result['errors'], quality_utils.format_quality_report(result), {
+        'clips': len(result['clips']), 'failed': [path for path, _ in result['errors']],
+        'quality_path': result['quality_path'], 'metrics_path': result['metrics_path']}
+
+
+def run_reindex(args):
+    import split_utils
+
+    message = split_utils.reindex_files(args.input)
+    return True, message, {}
+
+
+def build_parser():
+    """
+        Build the parser of the command line, with one subcommand per tab of the web UI.
+
+        Returns:
+            argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(prog='cli_main.py', description='Audio Dataset Manager, without the web UI.')
+    parser.add_argument('--json', action='store_true', help='Print a single JSON object with the result on stdout, the logs go to stderr.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help='Convert every audio of a folder with ffmpeg.')
+    convert.add_argument('input', help='The folder holding the audios to convert.')
+    convert.add_argument('output', help='The folder to write the converted audios to.')
+    convert.add_argument('--format', default='.wav', help='The extension to convert to, such as .wav or .mp3.')
+    convert.add_argument('--workers', type=int, default=None, help='The number of audios converted at the same time, one per core by default.')
+    convert.set_defaults(run=run_convert)
+
+    analyze = commands.add_parser('analyze', help='Analyze the silences of audio files.')
+    analyze.add_argument('files', nargs='+', help='The audio files to analyze.')
+    analyze.set_defaults(run=run_analyze)
+
+    analyze_folder = commands.add_parser('analyze-folder', help='Analyze every audio of a folder and report them in one table.')
+    analyze_folder.add_argument('input', help='The folder holding the audios to analyze.')
+    analyze_folder.add_argument('--time-threshold', type=float, default=0.5, help='The silence duration the usable clips are predicted with, in seconds.')
+    analyze_folder.add_argument('--workers', type=int, default=1, help='The number of audios analyzed at the same time.')
+    analyze_folder.set_defaults(run=run_analyze_folder)
+
+    split = commands.add_parser('split', help='Split every audio of a folder into clips, and transcribe them if requested.')
+    split.add_argument('input', help='The folder holding the audios to split.')
+    split.add_argument('output', help='The folder to write the clips to.')
+    split.add_argument('--time-threshold', type=float, default=0.5, help='The shortest silence to cut at, in seconds.')
+    split.add_argument('--transcribe', action='store_true', help='Transcribe the clips and use the transcription in their names.')
+    split.add_argument('--model', default='base', help='The Whisper model used with --transcribe.')
+    split.add_argument('--silence-backend', choices=['numpy', 'ffmpeg'], default='numpy')
+    split.add_argument('--split-mode', choices=['memory', 'temp_files'], default='memory')
+    split.add_argument('--segmentation', choices=['planner', 'recursive'], default='planner')
+    split.add_argument('--output-mode', choices=['files', 'index'], default='files')
+    split.add_argument('--workers', type=int, default=1, help='The number of audios split at the same time.')
+    split.add_argument('--batch-size', type=int, default=whisper_utils.DEFAULT_BATCH_SIZE, help='The number of clips transcribed together, 1 to disable batching.')
+    split.add_argument('--max-wait', type=float, default=whisper_utils.DEFAULT_MAX_WAIT, help='The longest time a clip waits for its transcription batch, in seconds.')
+    split.add_argument('--sample-rate', type=int, default=None, help='Resample the clips, such as 22050 for Tortoise and ai-voice-cloning.')
+    split.add_argument('--mono', action='store_true', help='Downmix the clips to mono.')
+    split.add_argument('--loudness', type=float, default=None, help='Normalize the loudness of every clip, in LUFS.')
+    split.add_argument('--peak', type=float, default=None, help='With --loudness the highest peak allowed, alone the peak every clip is normalized to, in dBFS.')
+    split.set_defaults(run=run_split)
+
+    materialize = commands.add_parser('materialize', help='Write the clips of the cut indexes of a split made with --output-mode index.')
+    materialize.add_argument('input', help='The output folder of the split, or the folder of one of its sources.')
+    materialize.set_defaults(run=run_materialize)
+
+    transcribe = commands.add_parser('transcribe', help='Transcribe every audio of a folder to a whisper.json file.')
+    transcribe.add_argument('input', help='The folder holding the audios to transcribe.')
+    transcribe.add_argument('output', help='The folder to write whisper.json to.')
+    transcribe.add_argument('--model', default='base', help='The Whisper model to use.')
+    transcribe.set_defaults(run=run_transcribe)
+
+    quality = commands.add_parser('quality', help='Measure the clipping, SNR, loudness, DC offset and silences of every clip of a folder.')
+    quality.add_argument('input', help='The folder holding the clips, its subfolders included.')
+    quality.add_argument('--workers', type=int, default=1, help='The number of processes measuring clips at the same time.')
+    quality.set_defaults(run=run_quality)
+
+    reindex = commands.add_parser('reindex', help='Renumber the audios of a folder sequentially.')
+    reindex.add_argument('input', help='The folder holding the audios to reindex.')
+    reindex.set_defaults(run=run_reindex)
+
+    return parser
+
+
+def main(argv=None):
+    """
+        Run a command of the command line.
+
+        Args:
+            argv (list, optional): The arguments, defaults to the ones of the process.
+
+        Returns:
+            int: The exit code: 0 on success, 1 if anything failed, 2 on invalid arguments, 130 if interrupted.
+    """
+    parser = build_parser()
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as error:
+        return EXIT_USAGE if error.code else EXIT_OK
+
+    # In JSON mode stdout must only hold the result: everything the commands print, including in worker processes
+    # which inherit the file descriptors, is sent to stderr instead
+    result_output = sys.stdout
+    if args.json:
+        sys.stdout.flush()
+        result_output = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    try:
+        ok, message, details = args.run(args)
+        exit_code = EXIT_OK if ok else EXIT_FAILED
+    except KeyboardInterrupt:
+        ok, message, details, exit_code = False, 'Interrupted.', {}, EXIT_INTERRUPTED
+    except Exception as error:
+        ok, message, details, exit_code = False, f'{type(error).__name__}: {error}', {}, EXIT_FAILED
+
+    if args.json:
+        json.dump(dict({'command': args.command, 'ok': ok, 'exit_code': exit_code, 'message': message}, **details), result_output, ensure_ascii=False)
+        result_output.write('\n')
+        result_output.flush()
+    else:
+        print(message, file=sys.stdout if ok else sys.stderr)
+
+    return exit_code
+
+
+# The split command can spawn worker processes, which re-import this module: only the main process runs the command
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,8 @@
 import gradio as gr
-import analyze_utils as utils
 import os
 
+# The utils of the tab are only imported when one of its buttons is first used, to keep the startup of the app fast
+
 def auto_fill_output(input_folder):
     """
         Automatically generate an output folder path based on the input folder.
@@ -35,6 +36,40 @@ def auto_fill_output(input_folder):
 
 
 
+def convert_audios(input_folder, export_folder, export_format, workers, progress=gr.Progress()):
+    """
+        Convert the audios of the tab, reporting the progress of each audio in the interface.
+
+        Returns:
+            str: The message of analyze_utils.convert_main.
+    """
+    import analyze_utils
+    return analyze_utils.convert_main(input_folder, export_folder, export_format, progress, workers)
+
+
+def analyze_audios(files):
+    """
+        Analyze the audios of the tab.
+
+        Returns:
+            str: The message of analyze_utils.analyze_main.
+    """
+    import analyze_utils
+    return analyze_utils.analyze_main(files)
+
+
+
+def analyze_folder_audios(input_folder, time_threshold, workers, progress=gr.Progress()):
+    """
+        Analyze the audios of a folder, reporting the progress of each audio in the interface.
+
+        Returns:
+            str: The report of analyze_utils.analyze_folder_main.
+    """
+    import analyze_utils
+    return analyze_utils.analyze_folder_main(input_folder, time_threshold, workers, progress)
+
+
 def create_analyze_audio_interface():
     """
         Create the Gradio interface for analyzing and converting audio files.
@@ -47,7 +82,9 @@ def create_analyze_audio_interface():
         
         with gr.Tab('Analyze audios'):
             analyze_readme_text = '''
-                The feature of this tab is not fully developped yet. But basically, it will allow you to input an audio, and analyze its silences.
+                This tab analyzes the silences of an audio, to choose the settings of the split tab before running it.
+                It reports the speech and silence time, the durations of the pauses at several silence levels, and for each
+                time threshold the clips the split tab would cut. The recommended time threshold keeps the most audio in usable clips.
 
             '''
 
@@ -64,13 +101,44 @@ def create_analyze_audio_interface():
                         label="Choose an audio to analyze",
                         waveform_options={'show_controls':True})
                     
-                    analyze_btn = gr.Button("Analyze (WIP)")
+                    analyze_btn = gr.Button("Analyze")
 
                 with gr.Column():
                     analyze_out=gr.TextArea(label='Console Output')
 
                     
-                analyze_btn.click(fn=utils.analyze_main, inputs=[files_input], outputs=analyze_out)
+                analyze_btn.click(fn=analyze_audios, inputs=[files_input], outputs=analyze_out)
+
+        with gr.Tab('Analyze a folder'):
+            analyze_folder_readme_text = '''
+                This tab analyzes every audio of a folder and reports them in one table: duration, share of speech, pause percentiles,
+                loudness, and the usable clips the split tab would cut with the chosen silence duration.
+                The analyses are cached, so that reopening the report after adding a file only analyzes that file.
+            '''
+
+            analyze_folder_readme_textbox = gr.Markdown(label="What is this tab about?", value=analyze_folder_readme_text)
+
+            with gr.Row():
+                with gr.Column():
+
+                    analyze_input_folder = gr.Textbox(
+                                    label="Input Folder",
+                                    info = "Write the folder to your input audios")
+
+                    analyze_time_threshold = gr.Number(label = 'Silence duration',
+                                                       info = 'The silence duration you plan to split with, in seconds',
+                                                       value = 0.5)
+
+                    analyze_workers = gr.Slider(label='Parallel files', minimum=1, maximum=max(1, os.cpu_count() or 1), step=1, value=1,
+                                                info='The number of audios analyzed at the same time, each in its own process.')
+
+                    analyze_folder_btn = gr.Button("Analyze folder")
+
+                with gr.Column():
+                    analyze_folder_out=gr.TextArea(label='Console Output')
+
+                analyze_folder_btn.click(fn=analyze_folder_audios, inputs=[analyze_input_folder, analyze_time_threshold, analyze_workers],
+                                         outputs=analyze_folder_out)
         
         with gr.Tab('Convert audios'):
             convert_readme_text = '''
@@ -99,6 +167,10 @@ def create_analyze_audio_interface():
                     export_format = gr.Dropdown(label='Export format',
                                                 info= 'What is the output format you want?',
                                                 choices=['.wav', '.mp3'])
+
+                    convert_workers = gr.Slider(label='Parallel conversions', minimum=1, maximum=max(1, os.cpu_count() or 1), step=1,
+                                                value=max(1, os.cpu_count() or 1),
+                                                info='The number of audios converted at the same time, the largest ones first.')
                     
                     convert_btn = gr.Button("Convert")
 
@@ -106,6 +178,6 @@ def create_analyze_audio_interface():
                     convert_out=gr.TextArea(label='Console Output')
 
                 auto_path_btn.click(fn=auto_fill_output, inputs=input_folder, outputs=export_folder)
-                convert_btn.click(fn=utils.convert_main, inputs=[input_folder, export_folder, export_format], outputs=convert_out)
+                convert_btn.click(fn=convert_audios, inputs=[input_folder, export_folder, export_format, convert_workers], outputs=convert_out)
 
     return interface
\ No newline at end of file
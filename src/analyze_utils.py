@@ -1,25 +1,553 @@
 
+import json
+import multiprocessing
 import os
+import re
 import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import numpy as np
+import fingerprint_utils
+import metrics_utils
+import silence_utils
+
+
+# Silence levels the pauses are measured at, in dBFS
+ANALYSIS_DECIBELS = (-50, -40, -35, -30, -23, -18)
+
+# Level and time thresholds the clips of the split tab are predicted with, in dBFS and seconds
+ANALYSIS_SPLIT_DECIBEL = -23
+ANALYSIS_THRESHOLDS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.8, 1.0, 1.5)
+
+# Shortest pause counted in the statistics, in seconds. Shorter dips are gaps inside words.
+ANALYSIS_MIN_PAUSE = 0.05
+
+ANALYSIS_PERCENTILES = (10, 25, 50, 75, 90, 99)
+PAUSE_HISTOGRAM_EDGES = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 5, np.inf)
+CLIP_HISTOGRAM_EDGES = (0, 0.61, 2, 4, 6, 8, 11, np.inf)
+
+# The silence indexes of the analyzed files, kept so that analyzing a file again doesn't extract its silences again
+ANALYSIS_INDEX_FOLDER = os.path.join(tempfile.gettempdir(), 'audio_dataset_manager', 'silence_index')
+
+# The analyses of folders are cached by content fingerprint, so that a file moved, renamed or shared by several folders is analyzed once.
+# The version is bumped whenever the content of an analysis changes, which discards the older cache.
+ANALYSIS_RESULTS_PATH = os.path.join(tempfile.gettempdir(), 'audio_dataset_manager', 'analyses.json')
+ANALYSIS_FINGERPRINTS_PATH = os.path.join(tempfile.gettempdir(), 'audio_dataset_manager', 'analysis_fingerprints.json')
+ANALYSIS_VERSION = 3
+
+# Number of ffmpeg processes converting at the same time by default, and lines of ffmpeg output reported when a conversion fails
+CONVERT_WORKERS = os.cpu_count() or 1
+CONVERT_ERROR_LINES = 3
+
+# The ffmpeg command of a conversion. It is part of the parameters an output was made with, so changing it converts everything again.
+FFMPEG_CONVERT_COMMAND = ("ffmpeg", "-nostdin", "-y", "-i", "{input}", "{output}")
+
+# Names of the files kept in a hidden folder of the export folder: what each output was converted from, and the fingerprints of the inputs.
+# They are kept out of the export folder itself, which the split tab and the folder analysis read next and where they only accept audios.
+CONVERT_STATE_FOLDER = '.convert'
+CONVERSIONS_NAME = 'conversions.json'
+CONVERT_FINGERPRINTS_NAME = 'fingerprints.json'
+
+# Suffix of the outputs being written, before the extension so that ffmpeg still infers the format from it
+PARTIAL_SUFFIX = '.part'
 
 
 def analyze_main(files):
     """
-        Analyzes silences in audio files using ffmpeg's silencedetect output.
+        Analyzes the silences of audio files, to choose the settings of the split tab without running it.
+
+        Args:
+            files (str | list): The path of an audio file, or a list of them.
+
+        Returns:
+            str: The report of every file, or a message if no file was given.
+    """
+    if not files:
+        return 'Choose an audio to analyze.'
+
+    return "\n\n".join(format_analysis(analysis) for analysis in analyze_files(files))
+
+
+def analyze_files(files):
+    """
+        Analyze the silences of audio files.
+
+        Args:
+            files (str | list): The path of an audio file, or a list of them.
+
+        Returns:
+            list: The analysis of each file, as returned by analyze_file.
+    """
+    if isinstance(files, str):
+        files = [files]
+
+    return [analyze_file(file) for file in files]
+
+
+def analyze_file(filepath, cache_folder=None, index_folder=ANALYSIS_INDEX_FOLDER):
+    """
+        Analyze the silences of an audio file: the file is decoded once, a single energy envelope gives its loudness,
+        and its silence index, the one the split tab uses, answers every level and threshold.
+
+        Args:
+            filepath (str): The path of the audio file.
+            cache_folder (str, optional): The folder for the decoded samples of the formats that can't be read in place.
+                                          By default they go to a temporary folder deleted once the file is analyzed.
+            index_folder (str): The folder the silence index of the file is kept in.
+
+        Returns:
+            dict: The duration of the file, the silence statistics at each level of ANALYSIS_DECIBELS,
+                  the predicted clips at each threshold of ANALYSIS_THRESHOLDS, and the recommended threshold.
+    """
+    import pcm_utils
+
+    if cache_folder is not None:
+        return analyze_buffer(filepath, pcm_utils.load_pcm_cache(filepath, cache_folder), index_folder)
+
+    # The samples are only mapped while they are analyzed, so the folder can be deleted once the analysis returns
+    with tempfile.TemporaryDirectory(prefix='audio_dataset_manager_') as cache_folder:
+        return analyze_buffer(filepath, pcm_utils.load_pcm_cache(filepath, cache_folder), index_folder)
+
+
+def analyze_buffer(filepath, buffer, index_folder=ANALYSIS_INDEX_FOLDER):
+    """
+        Analyze the silences of the decoded samples of an audio file.
+
+        Args:
+            filepath (str): The path of the audio file.
+            buffer (pcm_utils.PCMBuffer): The decoded samples of the file.
+            index_folder (str): The folder the silence index of the file is kept in.
+
+        Returns:
+            dict: The analysis, as returned by analyze_file.
+    """
+    envelope = silence_utils.compute_energy_envelope(buffer.samples, buffer.sample_rate, buffer.sample_width)
+    duration = buffer.duration
+    index = silence_utils.load_silence_index(filepath, buffer, index_folder, envelope)
+
+    # The silences of the index are the quiet runs of at least silence_utils.INDEX_MIN_SILENCE, shorter dips are not counted
+    levels = {}
+    for decibel in ANALYSIS_DECIBELS:
+        starts, ends = index.runs(decibel)
+        lengths = ends - starts
+
+        # Silence at the very start or end of the file is never a pause between two clips
+        interior = (starts > 0) & (ends < duration)
+        pauses = lengths[interior & (lengths >= ANALYSIS_MIN_PAUSE - 1e-9)]
+        silence_seconds = float(lengths.sum())
+
+        levels[decibel] = {
+            'silence_seconds': silence_seconds,
+            'speech_seconds': duration - silence_seconds,
+            'pauses': len(pauses),
+            'shortest': float(pauses.min()) if len(pauses) else None,
+            'longest': float(pauses.max()) if len(pauses) else None,
+            'mean': float(pauses.mean()) if len(pauses) else None,
+            'percentiles': dict(zip(ANALYSIS_PERCENTILES, np.percentile(pauses, ANALYSIS_PERCENTILES).tolist())) if len(pauses) else None,
+            'histogram': np.histogram(pauses, PAUSE_HISTOGRAM_EDGES)[0].tolist(),
+        }
+
+    # The clips the split tab would cut at each threshold with its default planner segmentation: the planner chooses among
+    # the same candidate pauses of its level, the threshold only changing which pauses it prefers
+    midpoints, lengths, depths = index.cut_candidates(ANALYSIS_SPLIT_DECIBEL)
+    predictions = {threshold: predict_planned_clips(midpoints, lengths, depths, duration, threshold) for threshold in ANALYSIS_THRESHOLDS}
+
+    # The loudness of the whole file and of its speech only, from the mean power of the frames, and the peak sample.
+    # The peak is found with reductions over the mapped samples, which never copy them.
+    power = np.power(10.0, envelope.astype(np.float64) / 10)
+    speech = envelope > ANALYSIS_SPLIT_DECIBEL
+    full_scale = float(2 ** (8 * buffer.sample_width - 1))
+    peak = max(abs(int(buffer.samples.max())), abs(int(buffer.samples.min()))) / full_scale if len(buffer.samples) else 0.0
+
+    # The recommended threshold keeps the most audio in usable clips, so that the fewest segments have to be split again.
+    # On a tie the longest one wins, as longer pauses are safer places to cut.
+    recommended = max(ANALYSIS_THRESHOLDS, key=lambda threshold: (round(predictions[threshold]['usable_seconds'], 1), threshold))
+
+    return {
+        'file': filepath,
+        'duration': duration,
+        'sample_rate': buffer.sample_rate,
+        'channels': buffer.channels,
+        'levels': levels,
+        'split_decibel': ANALYSIS_SPLIT_DECIBEL,
+        'predictions': predictions,
+        'recommended_time_threshold': recommended,
+        'loudness': {
+            'rms_dbfs': to_decibel(power.mean()) if len(power) else None,
+            'speech_rms_dbfs': to_decibel(power[speech].mean()) if speech.any() else None,
+            'peak_dbfs': to_decibel(peak ** 2),
+        },
+        # The pauses the split tab can cut at, to predict the clips of any other threshold without decoding the file again
+        'split_pauses': {
+            'midpoints': np.round(midpoints, 3).tolist(),
+            'lengths': np.round(lengths, 3).tolist(),
+            'depths': np.round(depths, 2).tolist(),
+        },
+    }
+
+
+def to_decibel(power):
+    """
+        Convert a mean power relative to full scale to dBFS.
+
+        Args:
+            power (float): The power, 1 being full scale.
+
+        Returns:
+            float: The power in dBFS, -inf being replaced by None so that it can be written to JSON.
+    """
+    return float(10 * np.log10(power)) if power > 0 else None
+
+
+def predict_yield(analysis, time_threshold):
+    """
+        Predict the clips the split tab would cut an analyzed file into with a given threshold.
+
+        Args:
+            analysis (dict): The analysis of the file, as returned by analyze_file.
+            time_threshold (float): The pause length the planner considers a natural cut point, in seconds.
+
+        Returns:
+            dict: The predicted clips, as returned by predict_clips.
+    """
+    pauses = {key: np.asarray(values, dtype=np.float64) for key, values in analysis['split_pauses'].items()}
+    return predict_planned_clips(pauses['midpoints'], pauses['lengths'], pauses['depths'], analysis['duration'], time_threshold)
+
+
+def predict_planned_clips(midpoints, lengths, depths, duration, time_threshold):
+    """
+        Predict the clips the planner segmentation of the split tab would cut an audio into.
+
+        Args:
+            midpoints (np.ndarray): The midpoint of each candidate pause, in seconds, sorted.
+            lengths (np.ndarray): The length of each candidate pause, in seconds.
+            depths (np.ndarray): The mean level of each candidate pause, in dBFS.
+            duration (float): The duration of the audio, in seconds.
+            time_threshold (float): The pause length the planner considers a natural cut point, in seconds.
+
+        Returns:
+            dict: The predicted clips, as returned by predict_clips.
+    """
+    cuts = silence_utils.plan_cuts(midpoints, lengths, depths, duration, time_threshold, ANALYSIS_SPLIT_DECIBEL) if len(midpoints) else []
+    return predict_clips(np.asarray(cuts, dtype=np.float64), duration)
+
+
+def predict_clips(cuts, duration):
+    """
+        Describe the clips an audio would be cut into.
+
+        Args:
+            cuts (np.ndarray): The times to cut at, in seconds, sorted.
+            duration (float): The duration of the audio, in seconds.
+
+        Returns:
+            dict: The number of clips, how many are usable, too short or too long, the share of the audio in usable clips,
+                  and the percentiles and histogram of the clip lengths.
+    """
+    import split_utils
+
+    lengths = np.diff(np.concatenate(([0.0], cuts, [duration])))
+    usable = (lengths >= split_utils.USABLE_MIN_DURATION) & (lengths <= split_utils.USABLE_MAX_DURATION)
+
+    return {
+        'clips': len(lengths),
+        'usable': int(usable.sum()),
+        'too_short': int((lengths < split_utils.USABLE_MIN_DURATION).sum()),
+        'too_long': int((lengths > split_utils.USABLE_MAX_DURATION).sum()),
+        'usable_seconds': float(lengths[usable].sum()),
+        'usable_ratio': float(lengths[usable].sum() / duration) if duration > 0 else 0.0,
+        'percentiles': dict(zip(ANALYSIS_PERCENTILES, np.percentile(lengths, ANALYSIS_PERCENTILES).tolist())),
+        'histogram': np.histogram(lengths, CLIP_HISTOGRAM_EDGES)[0].tolist(),
+    }
+
+
+def format_analysis(analysis):
+    """
+        Describe an analysis in a human readable way.
+
+        Args:
+            analysis (dict): The analysis of a file, as returned by analyze_file.
+
+        Returns:
+            str: The report of the file.
+    """
+    format_edges = lambda edges: [f'{low:g}-{high:g}s' if np.isfinite(high) else f'{low:g}s+' for low, high in zip(edges, edges[1:])]
+    format_percentiles = lambda percentiles: ', '.join(f'p{rank} {value:.2f}s' for rank, value in percentiles.items())
+
+    lines = [f"{os.path.basename(analysis['file'])}: {analysis['duration']:.1f}s, {analysis['sample_rate']} Hz, {analysis['channels']} channel(s)", '',
+             'Pauses at each silence level:']
+
+    for decibel, level in analysis['levels'].items():
+        lines.append(f"  {decibel} dB: {level['speech_seconds']:.1f}s of speech, {level['silence_seconds']:.1f}s of silence "
+                     f"({level['silence_seconds'] / analysis['duration']:.0%}), {level['pauses']} pauses")
+        if level['pauses']:
+            lines.append(f"    shortest {level['shortest']:.2f}s, mean {level['mean']:.2f}s, longest {level['longest']:.2f}s")
+            lines.append(f"    {format_percentiles(level['percentiles'])}")
+            lines.append('    ' + ', '.join(f'{edges}: {count}' for edges, count in zip(format_edges(PAUSE_HISTOGRAM_EDGES), level['histogram'])))
+
+    lines += ['', f"Predicted clips of the planner segmentation at {analysis['split_decibel']} dB for each time threshold:"]
+    for threshold, prediction in analysis['predictions'].items():
+        marker = '  <- recommended' if threshold == analysis['recommended_time_threshold'] else ''
+        lines.append(f"  {threshold:g}s: {prediction['clips']} clips, {prediction['usable']} usable ({prediction['usable_ratio']:.0%} of the audio), "
+                     f"{prediction['too_short']} too short, {prediction['too_long']} too long{marker}")
+        lines.append(f"    {format_percentiles(prediction['percentiles'])}")
+        lines.append('    ' + ', '.join(f'{edges}: {count}' for edges, count in zip(format_edges(CLIP_HISTOGRAM_EDGES), prediction['histogram'])))
+
+    lines += ['', f"Recommended time threshold for the split tab: {analysis['recommended_time_threshold']:g} seconds"]
+    return "\n".join(lines)
+
+def analyze_folder(input_folder, time_threshold=0.5, workers=1, progress=None, results_path=ANALYSIS_RESULTS_PATH):
+    """
+        Analyze every audio file of a folder, each in its own process if several workers are requested.
+        The analyses are cached by content fingerprint, so that only the files added or changed since the last report are decoded.
+
+        Args:
+            input_folder (str): The folder holding the audios to analyze.
+            time_threshold (float): The split threshold the usable clips are predicted with, in seconds.
+            workers (int): The number of files analyzed at the same time.
+            progress (callable, optional): Called with the completed fraction and a description after each file, like gr.Progress.
+            results_path (str): The path of the cache of the analyses.
+
+        Returns:
+            dict: The input files, the names of the ones that failed, the analysis of each file by path,
+                  the names of the files read from the cache, and the metrics summary of the run.
+
+        Raises:
+            ValueError: If the folder holds unsupported audio files.
+    """
+    import split_utils
+
+    files = split_utils.get_files(input_folder)
+
+    # get_files returns an error message instead of a list when the folder holds unsupported files
+    if isinstance(files, str):
+        raise ValueError(files)
+
+    results = load_analysis_results(results_path)
+    fingerprints = fingerprint_utils.FingerprintCache(ANALYSIS_FINGERPRINTS_PATH)
+    keys = {file: fingerprints.fingerprint(file) for file in files}
+    fingerprints.save()
+
+    analyses, failed, cached = {}, [], []
+    metrics = metrics_utils.RunMetrics('analyze', progress, total=len(files))
+
+    def collect(file, analysis=None, seconds=0.0, error=None):
+        # Each file is reported as soon as it is done, in whatever order the workers finish
+        if error is not None:
+            failed.append(os.path.basename(file))
+            print(f'{os.path.basename(file)} could not be analyzed: {error}')
+        else:
+            # The cached analysis holds the path the file had when it was analyzed, the report uses the current one
+            analyses[file] = dict(analysis, file=file)
+            results[keys[file]] = analysis
+            if file not in cached:
+                metrics.add('analyze', seconds, analysis['duration'], 1)
+            metrics.record(file=os.path.basename(file), audio_seconds=analysis['duration'], cached=file in cached)
+        metrics.advance(f'{os.path.basename(file)} ' + ('failed' if error is not None else 'analyzed'))
+
+    for file in files:
+        if keys[file] in results:
+            cached.append(file)
+            collect(file, results[keys[file]])
+
+    pending = [file for file in files if file not in cached]
+    workers = max(1, int(workers or 1))
+
+    # The decoded samples of each file are deleted as soon as it is analyzed, so that a folder never needs more
+    # than one decoded file per worker on disk. The folder of the run is deleted at the end, with whatever a failed worker left.
+    with tempfile.TemporaryDirectory(prefix='audio_dataset_manager_') as cache_folder:
+        if workers > 1 and len(pending) > 1:
+            # Spawned workers start from a clean interpreter, like the ones of the split tab
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(workers, len(pending)), mp_context=context) as executor:
+                futures = {executor.submit(timed_analyze_file, file, cache_folder): file for file in pending}
+                for future in as_completed(futures):
+                    try:
+                        collect(futures[future], *future.result())
+                    except Exception as error:
+                        collect(futures[future], error=error)
+
+        else:
+            for file in pending:
+                try:
+                    collect(file, *timed_analyze_file(file, cache_folder))
+                except Exception as error:
+                    collect(file, error=error)
+
+    if pending:
+        save_analysis_results(results_path, results)
+
+    metrics.finish()
+
+    # The analyses are reported in the order of the input folder
+    analyses = {file: analyses[file] for file in files if file in analyses}
+    return {'files': files, 'failed': failed, 'analyses': analyses, 'cached': [os.path.basename(file) for file in cached],
+            'time_threshold': time_threshold, 'metrics': metrics.summary()}
+
+
+def timed_analyze_file(filepath, cache_folder):
+    """
+        Analyze a file and measure how long it took, in the process of a worker. Its decoded samples are deleted once it is analyzed.
+
+        Args:
+            filepath (str): The path of the audio file.
+            cache_folder (str): The folder for the decoded samples of the formats that can't be read in place.
+
+        Returns:
+            tuple: The analysis of the file, and the seconds it took.
+    """
+    import pcm_utils
+
+    started = time.monotonic()
+    try:
+        analysis = analyze_file(filepath, cache_folder)
+    finally:
+        for cache_path in pcm_utils.get_cache_paths(filepath, cache_folder):
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+    return analysis, time.monotonic() - started
+
+
+def load_analysis_results(results_path):
+    """
+        Load the cached analyses, starting empty if the file doesn't exist, can't be read or was written by another version.
+
+        Args:
+            results_path (str): The path of the cache.
+
+        Returns:
+            dict: The analyses by content fingerprint.
+    """
+    try:
+        with open(results_path, 'r', encoding='utf-8') as results_file:
+            data = json.load(results_file)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(data, dict) or data.get('version') != ANALYSIS_VERSION:
+        return {}
+
+    return {fingerprint: restore_keys(analysis) for fingerprint, analysis in data['analyses'].items()}
+
+
+def restore_keys(analysis):
+    """
+        Convert the keys of a cached analysis back to numbers, as JSON only has string keys.
+
+        Args:
+            analysis (dict): The analysis read from the cache.
+
+        Returns:
+            dict: The same analysis, with the silence levels, thresholds and percentile ranks as numbers.
+    """
+    analysis['levels'] = {int(decibel): level for decibel, level in analysis['levels'].items()}
+    analysis['predictions'] = {float(threshold): prediction for threshold, prediction in analysis['predictions'].items()}
+    for entry in list(analysis['levels'].values()) + list(analysis['predictions'].values()):
+        if entry.get('percentiles'):
+            entry['percentiles'] = {int(rank): value for rank, value in entry['percentiles'].items()}
+    return analysis
+
+
+def save_analysis_results(results_path, results):
+    """
+        Write the cached analyses. The file is replaced atomically, so that a crash while saving leaves the previous one.
+
+        Args:
+            results_path (str): The path of the cache.
+            results (dict): The analyses by content fingerprint.
+    """
+    os.makedirs(os.path.dirname(results_path) or '.', exist_ok=True)
+    temporary_path = f'{results_path}.part'
+
+    with open(temporary_path, 'w', encoding='utf-8') as results_file:
+        json.dump({'version': ANALYSIS_VERSION, 'analyses': results}, results_file)
+
+    os.replace(temporary_path, results_path)
+
+
+def format_folder_report(result):
+    """
+        Describe the analysis of a folder as one table, with a line per file and a line for the whole folder.
+
+        Args:
+            result (dict): The result of analyze_folder.
+
+        Returns:
+            str: The report.
+    """
+    time_threshold = result['time_threshold']
+    format_optional = lambda value, unit='': f'{value:.1f}{unit}' if value is not None else '-'
+
+    header = f"{'File':<32} {'Duration':>9} {'Speech':>7} {'Pause p10/p50/p90':>20} {'RMS':>7} {'Speech':>7} {'Peak':>6} {'Clips':>6} {'Usable':>7} {'Yield':>6}"
+    lines = [f'Usable clips predicted for the planner segmentation with a {time_threshold:g} seconds threshold at {ANALYSIS_SPLIT_DECIBEL} dB, loudness in dBFS.', '',
+             header, '-' * len(header)]
+
+    totals = {'duration': 0.0, 'speech': 0.0, 'clips': 0, 'usable': 0, 'usable_seconds': 0.0}
+    for file, analysis in result['analyses'].items():
+        level = analysis['levels'][ANALYSIS_SPLIT_DECIBEL]
+        prediction = predict_yield(analysis, time_threshold)
+        loudness = analysis['loudness']
+        percentiles = level['percentiles']
+        pauses = f"{percentiles[10]:.2f}/{percentiles[50]:.2f}/{percentiles[90]:.2f}" if percentiles else '-'
+
+        name = os.path.basename(file)
+        name = name if len(name) <= 32 else name[:29] + '...'
+        lines.append(f"{name:<32} {analysis['duration'] / 60:>8.1f}m {level['speech_seconds'] / analysis['duration']:>7.0%} {pauses:>20} "
+                     f"{format_optional(loudness['rms_dbfs']):>7} {format_optional(loudness['speech_rms_dbfs']):>7} {format_optional(loudness['peak_dbfs']):>6} "
+                     f"{prediction['clips']:>6} {prediction['usable']:>7} {prediction['usable_ratio']:>6.0%}")
+
+        totals['duration'] += analysis['duration']
+        totals['speech'] += level['speech_seconds']
+        for key in ('clips', 'usable', 'usable_seconds'):
+            totals[key] += prediction[key]
+
+    if totals['duration'] > 0:
+        lines += ['-' * len(header),
+                  f"{'Total':<32} {totals['duration'] / 60:>8.1f}m {totals['speech'] / totals['duration']:>7.0%} {'':>20} {'':>7} {'':>7} {'':>6} "
+                  f"{totals['clips']:>6} {totals['usable']:>7} {totals['usable_seconds'] / totals['duration']:>6.0%}"]
+
+        # The threshold keeping the most audio in usable clips over the whole folder, like for a single file
+        usable_seconds = {threshold: sum(predict_yield(analysis, threshold)['usable_seconds'] for analysis in result['analyses'].values())
+                          for threshold in ANALYSIS_THRESHOLDS}
+        recommended = max(ANALYSIS_THRESHOLDS, key=lambda threshold: (round(usable_seconds[threshold], 1), threshold))
+        lines += ['', f"Predicted usable audio: {totals['usable_seconds'] / 60:.1f} of {totals['duration'] / 60:.1f} minutes.",
+                  f"Recommended time threshold for the whole folder: {recommended:g} seconds "
+                  f"({usable_seconds[recommended] / 60:.1f} minutes usable)."]
+
+    if result['cached']:
+        lines.append(f"{len(result['cached'])} of the {len(result['files'])} files were unchanged since their last analysis and read from the cache.")
+    if result['failed']:
+        lines.append(f"Could not be analyzed: {', '.join(result['failed'])}")
+
+    return "\n".join(lines)
+
+
+def analyze_folder_main(input_folder, time_threshold=0.5, workers=1, progress=None):
+    """
+        Analyze every audio file of a folder and report them in one table.
 
         Args:
-            files (list): A list of audio files to analyze.
+            input_folder (str): The folder holding the audios to analyze.
+            time_threshold (float): The split threshold the usable clips are predicted with, in seconds.
+            workers (int): The number of files analyzed at the same time.
+            progress (callable, optional): Called with the completed fraction and a description after each file, like gr.Progress.
 
         Returns:
-            str: A message indicating that the feature is not yet implemented.
+            str: The report, or the error preventing it.
     """
-    # TODO 
-    # automatically analyze silences with ffmpeg = analyze the silencedetect output, make the sum of all silence durations and divide by the number
-    # of silences found.
-    # Give the shortest silence period , the longest silence period, and the average silence period 
-    return('This feature is not yet implemented 😊')
+    if not input_folder or not os.path.isdir(input_folder):
+        return 'Choose a folder of audios to analyze.'
 
-def convert_main(input_folder, export_folder, export_format):
+    try:
+        result = analyze_folder(input_folder, float(time_threshold), workers, progress)
+    except ValueError as error:
+        return str(error)
+
+    return format_folder_report(result)
+
+
+def convert_main(input_folder, export_folder, export_format, progress=None, workers=None):
     """
         Converts audio files from a specified input folder to a specified export format in the export folder.
 
@@ -27,23 +555,266 @@ def convert_main(input_folder, export_folder, export_format):
             input_folder (str): The folder path containing the audio files to be converted.
             export_folder (str): The folder path where the converted audio files will be saved.
             export_format (str): The format to which the audio files will be converted.
+            progress (callable, optional): Called with the completed fraction and a description after each audio, like gr.Progress.
+            workers (int, optional): The number of ffmpeg processes run at the same time, one per core by default.
 
         Returns:
             str: A message indicating that the audios were converted.
     """
+    result = convert_files(input_folder, export_folder, export_format, progress, workers)
+
+    files, failed = result['files'], result['failed']
+    if failed:
+        return f'{len(files) - len(failed)} of your {len(files)} audios were converted.\n\n' + "\n".join(result['logs'])
+    
+    return 'Your audios were converted.\n\n' + "\n".join(result['logs'])
+
+
+def convert_files(input_folder, export_folder, export_format, progress=None, workers=None):
+    """
+        Convert every audio file of a folder with ffmpeg, a bounded number of files at a time. The arguments are the same as convert_main's.
+
+        Returns:
+            dict: The input files, the names of the ones that failed, the logs, and the metrics summary and path of the run.
+    """
     extensions = ['.wav', '.mp3', '.m4b', '.aac', '.mp4']
     export_format = export_format.lower()
 
     os.makedirs(export_folder, exist_ok=True)
 
-    for audio in os.listdir(input_folder):
-        if any(audio.endswith(ext) for ext in extensions):
-            audio_path = os.path.join(input_folder, audio)
-            name = os.path.splitext(audio)[0]
-            export_path = os.path.join(export_folder, f'{name}{export_format}')
-            ffmpeg_command = ["ffmpeg", "-i", audio_path, export_path ]
-            out = subprocess.Popen(ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    audios = [audio for audio in os.listdir(input_folder) if any(audio.endswith(ext) for ext in extensions)]
+    metrics = metrics_utils.RunMetrics('convert', progress, total=len(audios))
+    results = {}
 
-    
-    return 'Your audios were converted.'
+    # Outputs left half written by an interrupted run are removed, they never replaced a complete output
+    for name in os.listdir(export_folder):
+        if name.endswith(f'{PARTIAL_SUFFIX}{export_format}'):
+            os.remove(os.path.join(export_folder, name))
+
+    # An output is up to date if its input has the same content, it was converted with the same parameters,
+    # and it wasn't changed since. Only the inputs whose size or modification time changed are read to be fingerprinted.
+    state_folder = os.path.join(export_folder, CONVERT_STATE_FOLDER)
+    os.makedirs(state_folder, exist_ok=True)
+
+    # The files of previous versions, written in the export folder itself, are moved to the state folder
+    for legacy_name, name in (('.conversions.json', CONVERSIONS_NAME), ('.convert_fingerprints.json', CONVERT_FINGERPRINTS_NAME)):
+        if os.path.exists(os.path.join(export_folder, legacy_name)):
+            os.replace(os.path.join(export_folder, legacy_name), os.path.join(state_folder, name))
+
+    conversions_path = os.path.join(state_folder, CONVERSIONS_NAME)
+    conversions = load_conversions(conversions_path)
+    fingerprints = fingerprint_utils.FingerprintCache(os.path.join(state_folder, CONVERT_FINGERPRINTS_NAME))
+    params = {'command': list(FFMPEG_CONVERT_COMMAND), 'format': export_format}
+    keys = {audio: fingerprints.fingerprint(os.path.join(input_folder, audio)) for audio in audios}
+    fingerprints.save()
+
+    # Inputs with the same name and another extension, such as ch1.mp3 and ch1.m4b, would be converted to the same output:
+    # none of them is converted, rather than one silently replacing the other
+    outputs = {}
+    for audio in audios:
+        outputs.setdefault(get_converted_name(audio, export_format), []).append(audio)
+    collisions = {audio: names for names in outputs.values() if len(names) > 1 for audio in names}
+
+    pending = []
+    for audio in audios:
+        output = get_converted_name(audio, export_format)
+        if audio in collisions:
+            results[audio] = (None, '')
+            metrics.record(file=audio, audio_seconds=0.0, seconds=0.0, returncode=None, skipped=True)
+            metrics.advance(f'{audio} failed')
+        elif is_conversion_current(conversions.get(output), keys[audio], params, os.path.join(export_folder, output)):
+            results[audio] = (0, '')
+            metrics.record(file=audio, audio_seconds=0.0, seconds=0.0, returncode=0, skipped=True)
+            metrics.advance(f'{audio} up to date')
+        else:
+            pending.append(audio)
+
+    # The largest files are started first, their size standing for their duration without probing each of them:
+    # the longest conversion can't end up alone at the end of the run while the other workers are idle
+    pending.sort(key=lambda audio: os.path.getsize(os.path.join(input_folder, audio)), reverse=True)
+
+    # Each worker thread only waits on its ffmpeg process, so the pool bounds the number of conversions running at once
+    workers = max(1, min(int(workers or CONVERT_WORKERS), len(pending)))
+
+    # The manifest is saved even if the run is interrupted, so that the conversions already done are not done again.
+    # The executor is not used as a context manager: on an interruption, its exit would wait for every queued conversion.
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(convert_file, os.path.join(input_folder, audio), export_folder, export_format): audio for audio in pending}
+
+        # Each audio is reported as soon as its conversion ends
+        for future in as_completed(futures):
+            audio = futures[future]
+            try:
+                returncode, stderr, seconds = future.result()
+            except OSError as error:
+                returncode, stderr, seconds = None, str(error), 0.0
+
+            duration = get_ffmpeg_duration(stderr)
+            results[audio] = (returncode, stderr)
+
+            if returncode == 0:
+                output = get_converted_name(audio, export_format)
+                stat = os.stat(os.path.join(export_folder, output))
+                conversions[output] = {'source': audio, 'fingerprint': keys[audio], 'params': params,
+                                       'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+            metrics.add('ffmpeg', seconds, duration, 1)
+            metrics.record(file=audio, audio_seconds=duration, seconds=seconds, returncode=returncode, skipped=False)
+            metrics.advance(f'{audio} ' + ('converted' if returncode == 0 else 'failed'))
+    finally:
+        # The conversions not started yet are cancelled, and the ones running are waited for so that no ffmpeg outlives the run
+        executor.shutdown(wait=True, cancel_futures=True)
+        save_conversions(conversions_path, conversions)
+
+    # The failures are reported in the order of the input folder, with the end of what ffmpeg printed
+    failed = []
+    logs = []
+    for audio in sorted(results):
+        returncode, stderr = results[audio]
+        if audio in collisions:
+            failed.append(audio)
+            logs.append(f"{audio} could not be converted: {' and '.join(collisions[audio])} would be converted to the same {get_converted_name(audio, export_format)}")
+        elif returncode != 0:
+            failed.append(audio)
+            reason = f'ffmpeg exited with code {returncode}' if returncode is not None else 'ffmpeg could not be started'
+            details = stderr.strip().splitlines()[-CONVERT_ERROR_LINES:]
+            logs.append(f'{audio} could not be converted: {reason}\n' + "\n".join(f'    {line}' for line in details))
+
+    metrics.finish()
+    metrics_path = metrics.save(export_folder)
+    summary = metrics.summary()
+
+    if skipped := len(audios) - len(pending) - len(collisions):
+        logs.append(f'{skipped} audios were unchanged since their last conversion, skipped.')
+    if pending and summary['wall_seconds'] > 0:
+        logs.append(f"{len(pending) - len(failed) + len(collisions)} audios converted with {workers} workers: "
+                    f"{len(pending) / summary['wall_seconds'] * 60:.1f} files per minute, {summary['audio_seconds'] / summary['wall_seconds']:.1f} seconds of audio per second")
+    logs += metrics.report() + [f'Metrics saved to {metrics_path}']
+
+    # The export folder is the input of the split tab next: anything it would refuse is reported now rather than there
+    import split_utils
+    if isinstance(split_files := split_utils.get_files(export_folder), str):
+        logs.append(f'The export folder cannot be split as is: {split_files}')
+
+    return {'files': audios, 'failed': failed, 'logs': logs, 'metrics': summary, 'metrics_path': metrics_path}
+
+
+def convert_file(audio_path, export_folder, export_format):
+    """
+        Convert an audio file with ffmpeg and wait for it to end.
+        The output is written under a temporary name and renamed once complete, so that it is never left half written.
+
+        Args:
+            audio_path (str): The path of the audio to convert.
+            export_folder (str): The folder to write the converted audio to.
+            export_format (str): The extension to convert to, such as .wav or .mp3.
+
+        Returns:
+            tuple: The exit code of ffmpeg, what it printed, and the seconds the conversion took.
+    """
+    export_path = os.path.join(export_folder, get_converted_name(os.path.basename(audio_path), export_format))
+    name, extension = os.path.splitext(export_path)
+    temporary_path = f'{name}{PARTIAL_SUFFIX}{extension}'
+
+    # ffmpeg never reads the terminal, so that a question can't block its worker
+    ffmpeg_command = [argument.format(input=audio_path, output=temporary_path) for argument in FFMPEG_CONVERT_COMMAND]
+
+    started = time.monotonic()
+    out = subprocess.run(ffmpeg_command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    if out.returncode == 0:
+        os.replace(temporary_path, export_path)
+    elif os.path.exists(temporary_path):
+        os.remove(temporary_path)
+
+    return out.returncode, out.stderr.decode('utf-8', 'ignore'), time.monotonic() - started
+
+
+def get_converted_name(audio, export_format):
+    """
+        Get the name of the converted file of an audio.
+
+        Args:
+            audio (str): The name of the audio.
+            export_format (str): The extension to convert to, such as .wav or .mp3.
+
+        Returns:
+            str: The name of the converted file.
+    """
+    return f'{os.path.splitext(audio)[0]}{export_format}'
+
+
+def is_conversion_current(conversion, fingerprint, params, export_path):
+    """
+        Check whether a converted file is up to date.
+
+        Args:
+            conversion (dict): What the manifest recorded for the converted file, None if nothing.
+            fingerprint (str): The content fingerprint of the input.
+            params (dict): The parameters of the conversion.
+            export_path (str): The path of the converted file.
+
+        Returns:
+            bool: True if the file was converted from the same content with the same parameters, and wasn't changed since.
+    """
+    if conversion is None or conversion['fingerprint'] != fingerprint or conversion['params'] != params:
+        return False
+
+    try:
+        stat = os.stat(export_path)
+    except OSError:
+        return False
+
+    return stat.st_size == conversion['size'] and stat.st_mtime_ns == conversion['mtime_ns']
+
+
+def load_conversions(conversions_path):
+    """
+        Load the manifest of the conversions of an export folder, starting empty if it doesn't exist or can't be read.
+
+        Args:
+            conversions_path (str): The path of the manifest.
+
+        Returns:
+            dict: What each converted file was converted from, by name.
+    """
+    try:
+        with open(conversions_path, 'r', encoding='utf-8') as conversions_file:
+            return json.load(conversions_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_conversions(conversions_path, conversions):
+    """
+        Write the manifest of the conversions. The file is replaced atomically, so that a crash while saving leaves the previous one.
+
+        Args:
+            conversions_path (str): The path of the manifest.
+            conversions (dict): What each converted file was converted from, by name.
+    """
+    temporary_path = f'{conversions_path}{PARTIAL_SUFFIX}'
+
+    with open(temporary_path, 'w', encoding='utf-8') as conversions_file:
+        json.dump(conversions, conversions_file, indent=4, ensure_ascii=False)
+
+    os.replace(temporary_path, conversions_path)
+
+
+def get_ffmpeg_duration(ffmpeg_output):
+    """
+        Read the duration of the input from the output of ffmpeg.
+
+        Args:
+            ffmpeg_output (str): What ffmpeg printed.
+
+        Returns:
+            float: The duration of the input in seconds, 0 if ffmpeg didn't print it.
+    """
+    match = re.search(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)', ffmpeg_output)
+    if match is None:
+        return 0.0
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
 
@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+
+
+# Name of the checkpoint written in the output folder of each split audio
+CHECKPOINT_NAME = 'checkpoint.json'
+
+# Longest time between two saves of the checkpoint, in seconds. At most this much work is redone after a crash.
+CHECKPOINT_INTERVAL = 5.0
+
+
+class SplitCheckpoint():
+    """
+        Class to keep track of the progress of a split job, so that an interrupted job can continue where it stopped.
+
+        The clips are numbered in the order of the cuts, but the pipeline may finish them out of order:
+        the checkpoint only commits the longest run of consecutive clips that are all written and recorded in the manifest.
+        As the cuts only depend on the source and the split parameters, a rerun finds the same clips with the same numbers,
+        and skips the committed ones.
+    """
+
+    def __init__(self, checkpoint_path, params, interval=CHECKPOINT_INTERVAL):
+        """
+            Initialize an empty checkpoint. Use load to continue from a saved one.
+
+            Args:
+                checkpoint_path (str): The path of the checkpoint file.
+                params (dict): The source fingerprint and split parameters the clips depend on.
+                interval (float): The longest time between two saves, in seconds.
+        """
+        self.checkpoint_path = checkpoint_path
+        self.params = params
+        self.interval = interval
+        self.lock = threading.Lock()
+
+        # Every clip up to this number is written, and the source is cut up to this sample.
+        # The path and end sample of each committed clip are kept in order.
+        self.committed = 0
+        self.end_sample = 0
+        self.files = []
+        self.complete = False
+
+        # Clips written after a clip that is still in the pipeline, keyed by their number
+        self.pending = {}
+        self.last_save = time.monotonic()
+
+    @classmethod
+    def load(cls, checkpoint_path, params, interval=CHECKPOINT_INTERVAL):
+        """
+            Load the checkpoint of a previous run, if it was made with the same source and parameters.
+
+            Args:
+                checkpoint_path (str): The path of the checkpoint file.
+                params (dict): The source fingerprint and split parameters of this run.
+                interval (float): The longest time between two saves, in seconds.
+
+            Returns:
+                SplitCheckpoint: The restored checkpoint, or an empty one if there is nothing to continue.
+        """
+        checkpoint = cls(checkpoint_path, params, interval)
+
+        try:
+            with open(checkpoint_path, 'r', encoding='utf-8') as checkpoint_file:
+                saved = json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return checkpoint
+
+        # A checkpoint made with another source or other parameters describes other cuts: the job starts over
+        if saved.get('params') != params:
+            return checkpoint
+
+        # The clips are only trusted up to the first one whose file disappeared. Clips of a cut index have no file.
+        for path, end_sample in saved.get('files', []):
+            if path is not None and not os.path.isfile(os.path.join(os.path.dirname(checkpoint_path), path)):
+                break
+            checkpoint.committed += 1
+            checkpoint.end_sample = end_sample
+            checkpoint.files.append([path, end_sample])
+
+        checkpoint.complete = saved.get('complete', False) and checkpoint.committed == len(saved['files'])
+        return checkpoint
+
+    def is_committed(self, counter):
+        """
+            Check whether a clip was already written by a previous run.
+
+            Args:
+                counter (int): The number of the clip.
+
+            Returns:
+                bool: True if the clip can be skipped.
+        """
+        return counter <= self.committed
+
+    def add(self, counter, end_sample, path):
+        """
+            Record a written clip, and save the checkpoint if the last save is old enough.
+
+            Args:
+                counter (int): The number of the clip.
+                end_sample (int): The sample offset after the last sample of the clip in the source.
+                path (str): The path of the clip, relative to the output folder, None if the clip is only in the cut index.
+        """
+        with self.lock:
+            self.pending[counter] = (end_sample, path)
+
+            # Committing every clip that now follows the committed ones without a gap
+            while self.committed + 1 in self.pending:
+                self.committed += 1
+                self.end_sample, committed_path = self.pending.pop(self.committed)
+                self.files.append([committed_path, self.end_sample])
+
+            if time.monotonic() - self.last_save >= self.interval:
+                self.save()
+
+    def save(self, complete=False):
+        """
+            Write the checkpoint. The file is replaced atomically, so a crash while saving leaves the previous one.
+
+            Args:
+                complete (bool): Whether the whole source has been split.
+        """
+        self.complete = complete
+        temporary_path = f'{self.checkpoint_path}.part'
+
+        with open(temporary_path, 'w', encoding='utf-8') as checkpoint_file:
+            json.dump({
+                'params': self.params,
+                'committed': self.committed,
+                'end_sample': self.end_sample,
+                'files': self.files,
+                'complete': complete,
+            }, checkpoint_file, ensure_ascii=False)
+
+        os.replace(temporary_path, self.checkpoint_path)
+        self.last_save = time.monotonic()
+
+
+def get_checkpoint_path(output_folder):
+    """
+        Get the path of the checkpoint of a split output folder.
+
+        Args:
+            output_folder (str): The output folder of a split audio.
+
+        Returns:
+            str: The path of the checkpoint.
+    """
+    return os.path.join(output_folder, CHECKPOINT_NAME)
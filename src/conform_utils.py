@@ -0,0 +1,245 @@
+from dataclasses import dataclass
+import numpy as np
+from pydub import AudioSegment
+import silence_utils
+
+
+# Loudness measurement of ITU-R BS.1770: gating blocks and their step, in seconds, and absolute and relative gates, in LUFS and LU
+LOUDNESS_BLOCK = 0.4
+LOUDNESS_STEP = 0.1
+LOUDNESS_ABSOLUTE_GATE = -70.0
+LOUDNESS_RELATIVE_GATE = -10.0
+
+# The two filters of the K-weighting of BS.1770, designed for any sample rate: a high shelf boosting the highs by about 4 dB,
+# and a high pass removing the lows. Frequencies in Hz.
+K_SHELF_GAIN = 3.999843853973347
+K_SHELF_FREQUENCY = 1681.974450955533
+K_SHELF_Q = 0.7071752369554196
+K_HIGH_PASS_FREQUENCY = 38.13547087602444
+K_HIGH_PASS_Q = 0.5003270373238773
+
+
+@dataclass
+class ConformSettings():
+    """
+        Class to store what the clips are conformed to before being written. None keeps the property of the source.
+    """
+    sample_rate: int = None
+    channels: int = None
+    loudness: float = None
+    peak: float = None
+
+    @property
+    def enabled(self):
+        return any(value is not None for value in (self.sample_rate, self.channels, self.loudness, self.peak))
+
+
+def get_conform_settings(sample_rate=None, mono=False, loudness=None, peak=None):
+    """
+        Build the conform settings of a split from the choices of the interface or the command line.
+
+        Args:
+            sample_rate (int | str, optional): The sample rate of the clips, None or 'keep' to keep the one of the source.
+            mono (bool): Whether to downmix the clips to mono.
+            loudness (float, optional): The integrated loudness of the clips, in LUFS.
+            peak (float, optional): The highest sample peak of the clips, in dBFS.
+
+        Returns:
+            ConformSettings: The settings, None if nothing is conformed.
+    """
+    settings = ConformSettings(
+        sample_rate=int(sample_rate) if sample_rate not in (None, '', 'keep') else None,
+        channels=1 if mono else None,
+        loudness=float(loudness) if loudness is not None else None,
+        peak=float(peak) if peak is not None else None,
+    )
+    return settings if settings.enabled else None
+
+
+def conform_samples(samples, sample_rate, sample_width, settings):
+    """
+        Resample, downmix and normalize PCM samples in a single pass over them.
+        The samples go through one forward FFT: the resampling cuts or pads their spectrum, and the loudness is measured
+        by weighting that same spectrum, so that nothing is filtered sample by sample.
+
+        Args:
+            samples (np.ndarray): Integer PCM samples of shape (frames, channels).
+            sample_rate (int): The sample rate of the samples.
+            sample_width (int): The number of bytes per sample, kept for the conformed samples.
+            settings (ConformSettings): What to conform the samples to.
+
+        Returns:
+            tuple: The conformed integer samples of shape (frames, channels), and their sample rate.
+    """
+    full_scale = float(2 ** (8 * sample_width - 1))
+    audio = np.asarray(samples, dtype=np.float64) / full_scale
+
+    # Downmixing first, so that the rest only works on the channels kept
+    if settings.channels == 1 and audio.shape[1] > 1:
+        audio = audio.mean(axis=1, keepdims=True)
+    elif settings.channels is not None and settings.channels > audio.shape[1]:
+        audio = np.repeat(audio[:, :1], settings.channels, axis=1)
+
+    target_rate = settings.sample_rate or sample_rate
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}[sample_width]
+    spectrum = None
+
+    if not len(audio):
+        return np.zeros((0, audio.shape[1]), dtype=dtype), target_rate
+
+    if target_rate != sample_rate or settings.loudness is not None:
+        spectrum, length = resample_spectrum(audio, sample_rate, target_rate)
+        if target_rate != sample_rate:
+            audio = np.fft.irfft(spectrum, length, axis=0)
+
+    gain = 1.0
+    if settings.loudness is not None:
+        loudness = measure_loudness(spectrum, len(audio), target_rate)
+        if loudness is not None:
+            gain = 10 ** ((settings.loudness - loudness) / 20)
+
+    # With a loudness target the peak is a ceiling the gain is reduced to, without one the peak is normalized to it
+    if settings.peak is not None:
+        peak = float(np.abs(audio).max())
+        ceiling = 10 ** (settings.peak / 20)
+        if peak > 0 and (settings.loudness is None or peak * gain > ceiling):
+            gain = ceiling / peak
+
+    audio *= gain
+    conformed = np.clip(np.rint(audio * full_scale), -full_scale, full_scale - 1).astype(dtype)
+    return conformed, target_rate
+
+
+def conform_segment(segment, settings):
+    """
+        Conform a pydub AudioSegment, such as a clip about to be exported.
+
+        Args:
+            segment (AudioSegment): The audio to conform.
+            settings (ConformSettings): What to conform the audio to.
+
+        Returns:
+            AudioSegment: The conformed audio, with the sample width of the original.
+    """
+    samples, sample_rate = conform_samples(silence_utils.segment_to_samples(segment), segment.frame_rate, segment.sample_width, settings)
+    return AudioSegment(data=samples.tobytes(), sample_width=segment.sample_width, frame_rate=sample_rate, channels=samples.shape[1])
+
+
+def resample_spectrum(audio, sample_rate, target_rate):
+    """
+        Get the spectrum of audio at another sample rate: the bins above the new Nyquist frequency are dropped,
+        or empty ones are added. The clips start and end in a silence, so treating them as periodic doesn't add clicks.
+
+        Args:
+            audio (np.ndarray): Float samples of shape (frames, channels).
+            sample_rate (int): The sample rate of the audio.
+            target_rate (int): The sample rate to resample to.
+
+        Returns:
+            tuple: The spectrum at the target rate, and the number of samples it stands for.
+    """
+    length = int(round(len(audio) * target_rate / sample_rate))
+    spectrum = np.fft.rfft(audio, axis=0)
+
+    if length == len(audio):
+        return spectrum, length
+
+    resampled = np.zeros((length // 2 + 1, audio.shape[1]), dtype=spectrum.dtype)
+    bins = min(len(spectrum), len(resampled))
+    resampled[:bins] = spectrum[:bins]
+
+    # The inverse FFT divides by the number of samples, which changed
+    return resampled * (length / max(1, len(audio))), length
+
+
+def get_fft_length(length):
+    """
+        Get the shortest length of at least a number of samples whose FFT is fast, its only prime factors being 2, 3 and 5.
+        Padding audio with zeros to it before measuring its loudness avoids the slow FFT of lengths with a large prime factor.
+
+        Args:
+            length (int): The number of samples.
+
+        Returns:
+            int: The length to pad to.
+    """
+    best = 2 ** int(np.ceil(np.log2(max(1, length))))
+    power_of_five = 1
+    while power_of_five < best:
+        power_of_three = power_of_five
+        while power_of_three < best:
+            # The smallest power of two bringing this product to the length
+            candidate = power_of_three * 2 ** max(0, int(np.ceil(np.log2(length / power_of_three))))
+            best = min(best, candidate)
+            power_of_three *= 3
+        power_of_five *= 5
+    return best
+
+
+def k_weighting(frequencies, sample_rate):
+    """
+        Compute the frequency response of the K-weighting filters of BS.1770.
+
+        Args:
+            frequencies (np.ndarray): The frequencies to evaluate, in Hz.
+            sample_rate (int): The sample rate the filters run at.
+
+        Returns:
+            np.ndarray: The complex response at each frequency.
+    """
+    z = np.exp(-2j * np.pi * frequencies / sample_rate)
+
+    def biquad(b0, b1, b2, a0, a1, a2):
+        return (b0 + b1 * z + b2 * z ** 2) / (a0 + a1 * z + a2 * z ** 2)
+
+    # High shelf, its gain at the highs being Vh and at the shelf frequency about its square root
+    K = np.tan(np.pi * K_SHELF_FREQUENCY / sample_rate)
+    Vh = 10 ** (K_SHELF_GAIN / 20)
+    Vb = Vh ** 0.4996667741545416
+    shelf = biquad(Vh + Vb * K / K_SHELF_Q + K ** 2, 2 * (K ** 2 - Vh), Vh - Vb * K / K_SHELF_Q + K ** 2,
+                   1 + K / K_SHELF_Q + K ** 2, 2 * (K ** 2 - 1), 1 - K / K_SHELF_Q + K ** 2)
+
+    # High pass
+    K = np.tan(np.pi * K_HIGH_PASS_FREQUENCY / sample_rate)
+    high_pass = biquad(1, -2, 1, 1 + K / K_HIGH_PASS_Q + K ** 2, 2 * (K ** 2 - 1), 1 - K / K_HIGH_PASS_Q + K ** 2)
+
+    return shelf * high_pass
+
+
+def measure_loudness(spectrum, length, sample_rate, fft_length=None):
+    """
+        Measure the integrated loudness of audio from its spectrum, as BS.1770 does: K-weighted power of 400 ms blocks,
+        the blocks under the absolute gate and then under the relative gate being left out.
+
+        Args:
+            spectrum (np.ndarray): The spectrum of the audio, of shape (bins, channels), as computed by np.fft.rfft.
+            length (int): The number of samples of the audio.
+            sample_rate (int): The sample rate of the audio.
+            fft_length (int, optional): The number of samples the spectrum was computed on, if the audio was padded with zeros.
+
+        Returns:
+            float: The loudness in LUFS, None if the audio is silent.
+    """
+    fft_length = fft_length or length
+    frequencies = np.fft.rfftfreq(fft_length, 1 / sample_rate)
+    weighted = np.fft.irfft(spectrum * k_weighting(frequencies, sample_rate)[:, None], fft_length, axis=0)[:length]
+
+    # The mean square of every block, from the running sum of the squares summed over the channels.
+    # Audio shorter than a block is measured as a single block.
+    power = np.concatenate(([0.0], np.cumsum((weighted ** 2).sum(axis=1))))
+    block = min(length, int(round(LOUDNESS_BLOCK * sample_rate)))
+    step = max(1, int(round(LOUDNESS_STEP * sample_rate)))
+    if block == 0:
+        return None
+
+    starts = np.arange(0, length - block + 1, step)
+    blocks = (power[starts + block] - power[starts]) / block
+
+    to_lufs = lambda mean_square: -0.691 + 10 * np.log10(mean_square)
+    with np.errstate(divide='ignore'):
+        blocks = blocks[to_lufs(blocks) > LOUDNESS_ABSOLUTE_GATE]
+    if not len(blocks):
+        return None
+
+    blocks = blocks[to_lufs(blocks) > to_lufs(blocks.mean()) + LOUDNESS_RELATIVE_GATE]
+    return float(to_lufs(blocks.mean()))
@@ -0,0 +1,128 @@
+import os
+import numpy as np
+import export_utils
+import fingerprint_utils
+import pcm_utils
+
+
+# Name of the cut index written in the output folder of a split audio, instead of the clips
+CUT_INDEX_NAME = 'cuts.npz'
+
+
+def save_cut_index(index_path, source, cache_folder, fingerprint, sample_rate, counters, starts, ends, usable):
+    """
+        Write a cut index: where each clip of a source starts and ends, without any audio.
+        The file is replaced atomically, so that a crash while saving leaves the previous one.
+
+        Args:
+            index_path (str): The path of the cut index.
+            source (str): The path of the source audio.
+            cache_folder (str): The folder holding the PCM cache of the source.
+            fingerprint (str): The content fingerprint of the source, to detect a source changed since.
+            sample_rate (int): The sample rate of the source.
+            counters (list): The number of each clip.
+            starts (list): The first sample offset of each clip.
+            ends (list): The sample offset after the last sample of each clip.
+            usable (list): Whether each clip has a duration usable by MRQ ai-voice-cloning.
+    """
+    temporary_path = f'{index_path}.part'
+
+    # np.savez adds its extension to paths, but not to file handles
+    with open(temporary_path, 'wb') as index_file:
+        np.savez(index_file,
+                 source=np.array(source),
+                 cache_folder=np.array(cache_folder or ''),
+                 fingerprint=np.array(fingerprint),
+                 sample_rate=np.array(sample_rate, dtype=np.int64),
+                 counters=np.asarray(counters, dtype=np.int64),
+                 starts=np.asarray(starts, dtype=np.int64),
+                 ends=np.asarray(ends, dtype=np.int64),
+                 usable=np.asarray(usable, dtype=bool))
+
+    os.replace(temporary_path, index_path)
+
+
+class CutIndex():
+    """
+        Class to read the clips of a cut index lazily: the source is only mapped when a clip is first asked for,
+        and each clip is served as a view on the mapped samples, without copying or re-encoding anything.
+    """
+
+    def __init__(self, index_path, verify=True):
+        """
+            Load the cut index. The source itself is not opened yet.
+
+            Args:
+                index_path (str): The path of the cut index.
+                verify (bool): Whether to check that the source did not change since the index was written, when it is opened.
+        """
+        with np.load(index_path) as data:
+            self.source = str(data['source'])
+            self.cache_folder = str(data['cache_folder']) or None
+            self.fingerprint = str(data['fingerprint'])
+            self.sample_rate = int(data['sample_rate'])
+            self.counters = data['counters']
+            self.starts = data['starts']
+            self.ends = data['ends']
+            self.usable = data['usable']
+
+        self.verify = verify
+        self.buffer = None
+
+    def __len__(self):
+        return len(self.counters)
+
+    @property
+    def durations(self):
+        return (self.ends - self.starts) / self.sample_rate
+
+    def open(self):
+        """
+            Map the samples of the source, on the first call only.
+
+            Returns:
+                pcm_utils.PCMBuffer: The buffer of the source.
+
+            Raises:
+                ValueError: If the source changed since the cut index was written, making its offsets meaningless.
+        """
+        if self.buffer is None:
+            if self.verify and fingerprint_utils.content_fingerprint(self.source) != self.fingerprint:
+                raise ValueError(f'{self.source} changed since its cut index was written, split it again.')
+            self.buffer = pcm_utils.load_pcm_cache(self.source, self.cache_folder)
+        return self.buffer
+
+    def samples(self, index):
+        """
+            Get the samples of a clip, as a view on the source.
+
+            Args:
+                index (int): The position of the clip in the index.
+
+            Returns:
+                np.ndarray: The samples of shape (frames, channels).
+        """
+        return self.open().view(int(self.starts[index]), int(self.ends[index]))
+
+    def segment(self, index):
+        """
+            Get a clip as an AudioSegment, to play, transcribe or export it.
+
+            Args:
+                index (int): The position of the clip in the index.
+
+            Returns:
+                AudioSegment: The audio of the clip.
+        """
+        return self.open().to_segment(int(self.starts[index]), int(self.ends[index]))
+
+    def materialize(self, index, segment_path, export_format='wav'):
+        """
+            Write a clip to its own file.
+
+            Args:
+                index (int): The position of the clip in the index.
+                segment_path (str): The path of the file to write.
+                export_format (str): The format to export the clip.
+        """
+        export_utils.write_segment(self.segment(index), segment_path, export_format)
@@ -0,0 +1,89 @@
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Default number of clips encoded at the same time. Encoding mostly happens in ffmpeg processes, so threads are enough.
+DEFAULT_EXPORT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class ExportWriter():
+    """
+        Class to encode and write clips on a pool of background threads while the splitter keeps cutting.
+        The number of clips waiting to be written is bounded: when it is reached, submitting blocks until a clip is done.
+    """
+
+    def __init__(self, workers=DEFAULT_EXPORT_WORKERS, max_pending=None):
+        """
+            Initialize the writer and its thread pool.
+
+            Args:
+                workers (int): The number of clips encoded at the same time.
+                max_pending (int, optional): The number of clips allowed to wait in memory. Defaults to four per worker.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export')
+        self.pending = threading.BoundedSemaphore(max_pending or workers * 4)
+        self.futures = {}
+
+    def submit(self, segment, segment_path, export_format, callback=None):
+        """
+            Queue a clip to be written, waiting first if too many clips are already pending.
+
+            Args:
+                segment (AudioSegment): The audio segment to export.
+                segment_path (str): The path of the file to write.
+                export_format (str): The format to export the audio segment.
+                callback (callable, optional): Called with the encoded bytes once the clip is written.
+        """
+        self.pending.acquire()
+        future = self.executor.submit(write_segment, segment, segment_path, export_format, callback)
+        future.add_done_callback(lambda _: self.pending.release())
+        self.futures[future] = segment_path
+
+    def close(self):
+        """
+            Wait for every pending clip to be written, then stop the pool.
+
+            Returns:
+                list: The (path, error) pairs of the clips that could not be written.
+        """
+        self.executor.shutdown(wait=True)
+        failures = [(path, future.exception()) for future, path in self.futures.items() if future.exception() is not None]
+        self.futures.clear()
+        return failures
+
+
+def encode_segment(segment, export_format):
+    """
+        Encode an audio segment in memory.
+
+        Args:
+            segment (AudioSegment): The audio segment to encode.
+            export_format (str): The format to encode the audio segment to.
+
+        Returns:
+            bytes: The encoded file.
+    """
+    encoded = io.BytesIO()
+    segment.export(encoded, format=export_format)
+    return encoded.getvalue()
+
+
+def write_segment(segment, segment_path, export_format, callback=None):
+    """
+        Encode and write one clip.
+
+        Args:
+            segment (AudioSegment): The audio segment to export.
+            segment_path (str): The path of the file to write.
+            export_format (str): The format to export the audio segment.
+            callback (callable, optional): Called with the encoded bytes once the clip is written.
+    """
+    data = encode_segment(segment, export_format)
+    with open(segment_path, 'wb') as segment_file:
+        segment_file.write(data)
+    print(f"Saved {segment_path}")
+
+    if callback is not None:
+        callback(data)
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+
+
+# Number of bytes hashed at the start, the middle and the end of a file to fingerprint it
+FINGERPRINT_SAMPLE_SIZE = 1024 * 1024
+
+
+def content_fingerprint(path, sample_size=FINGERPRINT_SAMPLE_SIZE):
+    """
+        Fingerprint the content of a file without reading all of it: the size of the file and
+        samples taken at its start, middle and end are hashed together.
+
+        Args:
+            path (str): The path to the file.
+            sample_size (int): The number of bytes hashed at each position.
+
+        Returns:
+            str: The hexadecimal fingerprint.
+    """
+
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode('utf-8'))
+
+    with open(path, 'rb') as file:
+        # Small files are hashed entirely
+        if size <= 3 * sample_size:
+            digest.update(file.read())
+        else:
+            for position in (0, (size - sample_size) // 2, size - sample_size):
+                file.seek(position)
+                digest.update(file.read(sample_size))
+
+    return digest.hexdigest()
+
+
+class FingerprintCache():
+    """
+        Class to remember the fingerprints of files, so that files whose size and modification time did not change
+        are not read again. The cache is kept in a JSON file.
+    """
+
+    def __init__(self, cache_path):
+        """
+            Load the cache, starting empty if the file doesn't exist or can't be read.
+
+            Args:
+                cache_path (str): The path of the cache file.
+        """
+        self.cache_path = cache_path
+
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as cache_file:
+                self.entries = json.load(cache_file)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def fingerprint(self, path):
+        """
+            Get the fingerprint of a file, from the cache if the file did not change since it was computed.
+
+            Args:
+                path (str): The path to the file.
+
+            Returns:
+                str: The hexadecimal fingerprint.
+        """
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = self.entries.get(key)
+
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['fingerprint']
+
+        fingerprint = content_fingerprint(path)
+        self.entries[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'fingerprint': fingerprint}
+        return fingerprint
+
+    def save(self):
+        """
+            Write the cache. The file is replaced atomically, so that a crash while saving leaves the previous one.
+        """
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        temporary_path = f'{self.cache_path}.part'
+
+        with open(temporary_path, 'w', encoding='utf-8') as cache_file:
+            json.dump(self.entries, cache_file)
+
+        os.replace(temporary_path, self.cache_path)
@@ -14,6 +14,7 @@ class AudioJsonHandler():
         self.audio_folder = None
         self.keep_start_audio = False
         self.keep_end_audio = False
+        self.quality = None
     
     def get_json(self, path,):
         """
@@ -49,6 +50,9 @@ class AudioJsonHandler():
         original_json_path = os.path.join(json_folder, original_json_file)
         self.audio_folder = os.path.join(json_folder, "audio")
 
+        # The quality metrics of the clips measured from the split tab, loaded by measured folder as the clips are shown
+        self.quality = {}
+
         # Create a backup
         json_name = os.path.splitext(original_json_file)[0]
         backup_json_file = f'{json_name}_backup.json'
@@ -470,6 +474,13 @@ class AudioJsonHandler():
             segments = self.json_data[audio_name].get('segments', [])
             new_segment_group = create_segment_group(segments)
 
+            # Showing the quality of the clip, unless there is something else to say
+            if not info_message and self.quality is not None:
+                import quality_utils
+                measured = quality_utils.find_clip_quality(audio_path, self.quality)
+                if measured is not None:
+                    info_message = quality_utils.describe_clip(*measured) or ""
+
 
 
             return [audio_path, audio_name, index + 1, current_page_label, JSON_reference, info_message, delete_start_audio, delete_end_audio] + new_segment_group
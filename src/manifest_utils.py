@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+
+
+# Name of the manifest written in the output folder of each split audio
+MANIFEST_NAME = 'manifest.jsonl'
+
+
+class ManifestWriter():
+    """
+        Class to stream the description of each clip to a JSONL manifest as the clips are written.
+        One JSON object per line, so that readers never need to parse the whole file or touch the audio.
+    """
+
+    def __init__(self, manifest_path, mode='w'):
+        """
+            Open the manifest.
+
+            Args:
+                manifest_path (str): The path of the manifest file.
+                mode (str): 'w' to start a new manifest, 'a' to add rows to an existing one.
+        """
+        self.manifest_path = manifest_path
+        self.file = open(manifest_path, mode, encoding='utf-8')
+        self.lock = threading.Lock()
+
+    def write(self, row):
+        """
+            Add a row to the manifest. Rows are flushed right away so that the manifest follows the split as it goes.
+
+            Args:
+                row (dict): The description of a clip.
+        """
+        with self.lock:
+            self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+            self.file.flush()
+
+    def close(self):
+        """
+            Close the manifest.
+        """
+        with self.lock:
+            self.file.close()
+
+
+def read_manifest(manifest_path):
+    """
+        Read the rows of a manifest, one at a time.
+
+        Args:
+            manifest_path (str): The path of the manifest file.
+
+        Yields:
+            dict: The description of each clip. A truncated last line, left by an interrupted split, is skipped.
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
+        for line in manifest_file:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def truncate_manifest(manifest_path, counter):
+    """
+        Keep only the rows of the clips up to a given number, so that an interrupted split can go on appending to its manifest.
+        The clips after it will be written again, and recorded again.
+
+        Args:
+            manifest_path (str): The path of the manifest file.
+            counter (int): The number of the last clip to keep.
+    """
+    if not os.path.isfile(manifest_path):
+        return
+
+    rows = [row for row in read_manifest(manifest_path) if row.get('counter', 0) <= counter]
+    temporary_path = f'{manifest_path}.part'
+
+    with open(temporary_path, 'w', encoding='utf-8') as manifest_file:
+        for row in rows:
+            manifest_file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    os.replace(temporary_path, manifest_path)
+
+
+def get_manifest_path(output_folder):
+    """
+        Get the path of the manifest of a split output folder.
+
+        Args:
+            output_folder (str): The output folder of a split audio.
+
+        Returns:
+            str: The path of the manifest.
+    """
+    return os.path.join(output_folder, MANIFEST_NAME)
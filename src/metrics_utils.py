@@ -0,0 +1,181 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+
+# Name of the folder the metrics of each run are written to, in the output folder of the run
+METRICS_FOLDER = 'metrics'
+
+
+class RunMetrics():
+    """
+        Class to measure where the time of a run goes: wall time, audio processed, item counts and waiting time of each stage.
+        The progress is reported to a callback as the run goes, such as a gr.Progress, and the metrics can be saved as JSON.
+    """
+
+    def __init__(self, name, progress=None, total=None):
+        """
+            Start measuring a run.
+
+            Args:
+                name (str): The name of the run, such as 'split'.
+                progress (callable, optional): Called with the completed fraction and a description, like gr.Progress.
+                total (int, optional): The number of items the run will process, to compute the completed fraction.
+        """
+        self.name = name
+        self.progress = progress
+        self.total = total
+        self.done = 0
+        self.started_at = time.time()
+        self.started = time.monotonic()
+        self.finished = None
+
+        # Per stage totals, in the order the stages were first met
+        self.stages = {}
+
+        # One record per processed item, such as a file
+        self.items = []
+
+    def add(self, stage, seconds, audio_seconds=0.0, items=0, wait_seconds=0.0):
+        """
+            Add measurements to a stage.
+
+            Args:
+                stage (str): The name of the stage.
+                seconds (float): The time spent working in the stage.
+                audio_seconds (float): The duration of the audio the stage processed.
+                items (int): The number of items the stage processed.
+                wait_seconds (float): The time the stage spent waiting for work or for the next stage.
+        """
+        totals = self.stages.setdefault(stage, {'seconds': 0.0, 'audio_seconds': 0.0, 'items': 0, 'wait_seconds': 0.0})
+        totals['seconds'] += seconds
+        totals['audio_seconds'] += audio_seconds
+        totals['items'] += items
+        totals['wait_seconds'] += wait_seconds
+
+    @contextmanager
+    def stage(self, stage, audio_seconds=0.0, items=1):
+        """
+            Time the block of code it wraps as a stage.
+
+            Args:
+                stage (str): The name of the stage.
+                audio_seconds (float): The duration of the audio the block processes.
+                items (int): The number of items the block processes.
+        """
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(stage, time.monotonic() - started, audio_seconds, items)
+
+    def merge(self, summary):
+        """
+            Add the stages of another run, such as a file split in a worker process.
+
+            Args:
+                summary (dict): The summary of the other run.
+        """
+        for stage, totals in summary['stages'].items():
+            self.add(stage, totals['seconds'], totals['audio_seconds'], totals['items'], totals['wait_seconds'])
+
+    def record(self, **fields):
+        """
+            Record the measurements of one item of the run, such as a file.
+
+            Args:
+                **fields: The measurements, which must be JSON serializable.
+        """
+        self.items.append(fields)
+
+    def advance(self, description, count=1):
+        """
+            Mark items as done and report the progress.
+
+            Args:
+                description (str): What was just done.
+                count (int): The number of items done.
+        """
+        self.done += count
+        if self.progress is not None:
+            self.progress(self.done / self.total if self.total else None, desc=description)
+
+    def finish(self):
+        """
+            Stop the clock of the run.
+        """
+        self.finished = time.monotonic()
+
+    def summary(self):
+        """
+            Gather the metrics of the run.
+
+            Returns:
+                dict: The wall time, the audio processed and the realtime factor of the run and of each stage.
+        """
+        wall_seconds = (self.finished or time.monotonic()) - self.started
+        audio_seconds = sum(item.get('audio_seconds', 0.0) for item in self.items)
+
+        # The realtime factor is the number of seconds of audio processed per second: above 1 is faster than realtime
+        stages = {
+            stage: dict(totals, realtime_factor=totals['audio_seconds'] / totals['seconds'] if totals['seconds'] > 0 else None)
+            for stage, totals in self.stages.items()
+        }
+
+        return {
+            'run': self.name,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'wall_seconds': wall_seconds,
+            'audio_seconds': audio_seconds,
+            'realtime_factor': audio_seconds / wall_seconds if wall_seconds > 0 else None,
+            'stages': stages,
+            'items': self.items,
+        }
+
+    def report(self):
+        """
+            Describe the metrics in a human readable way.
+
+            Returns:
+                list: One line for the run, then one line per stage.
+        """
+        summary = self.summary()
+        lines = [f"{self.name}: {summary['wall_seconds']:.1f}s for {summary['audio_seconds']:.1f}s of audio"
+                 + (f" ({summary['realtime_factor']:.1f}x realtime)" if summary['realtime_factor'] else '')]
+
+        for stage, totals in summary['stages'].items():
+            realtime = f", {totals['realtime_factor']:.1f}x realtime" if totals['realtime_factor'] else ''
+            lines.append(f"  {stage}: {totals['seconds']:.1f}s for {totals['items']} items{realtime}, {totals['wait_seconds']:.1f}s waiting")
+
+        return lines
+
+    def save(self, output_folder):
+        """
+            Write the metrics of the run to a JSON file.
+
+            Args:
+                output_folder (str): The output folder of the run. The file goes in its metrics folder.
+
+            Returns:
+                str: The path of the metrics file.
+        """
+        metrics_folder = os.path.join(output_folder, METRICS_FOLDER)
+        os.makedirs(metrics_folder, exist_ok=True)
+
+        # The name goes down to the millisecond, and the file is only created if it doesn't exist yet:
+        # two runs started at the same time get a counter instead of overwriting each other's metrics
+        timestamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at)) + f'-{int(self.started_at * 1000) % 1000:03d}'
+        counter = 0
+        while True:
+            metrics_path = os.path.join(metrics_folder, f'{self.name}_{timestamp}' + (f'_{counter}' if counter else '') + '.json')
+            try:
+                metrics_file = open(metrics_path, 'x', encoding='utf-8')
+                break
+            except FileExistsError:
+                counter += 1
+
+        with metrics_file:
+            json.dump(self.summary(), metrics_file, indent=4, ensure_ascii=False)
+
+        return metrics_path
@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import struct
+import subprocess
+import numpy as np
+from pydub import AudioSegment
+from pydub.utils import mediainfo_json
+import silence_utils
+
+
+# Whisper expects mono float audio at this sample rate
+WHISPER_SAMPLE_RATE = 16000
+
+
+class PCMBuffer():
+    """
+        Class to hold a decoded audio source as raw PCM samples, addressed by sample offsets
+    """
+
+    def __init__(self, samples, sample_rate, sample_width):
+        """
+            Initialize the buffer around already decoded samples.
+
+            Args:
+                samples (np.ndarray): Integer PCM samples of shape (frames, channels).
+                sample_rate (int): The sample rate of the audio.
+                sample_width (int): The number of bytes per sample.
+        """
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+
+    @classmethod
+    def from_segment(cls, segment):
+        """
+            Wrap the samples of a pydub AudioSegment, without copying them.
+
+            Args:
+                segment (AudioSegment): The decoded audio.
+
+            Returns:
+                PCMBuffer: The buffer viewing the segment's samples.
+        """
+        return cls(silence_utils.segment_to_samples(segment), segment.frame_rate, segment.sample_width)
+
+    @property
+    def channels(self):
+        return self.samples.shape[1]
+
+    @property
+    def frame_count(self):
+        return len(self.samples)
+
+    @property
+    def duration(self):
+        return self.frame_count / self.sample_rate
+
+    def to_frame(self, seconds):
+        """
+            Convert a time in seconds into a sample offset, clamped to the buffer.
+
+            Args:
+                seconds (float): The time to convert.
+
+            Returns:
+                int: The matching sample offset.
+        """
+        return min(max(0, round(seconds * self.sample_rate)), self.frame_count)
+
+    def view(self, start_frame, end_frame):
+        """
+            Get the samples between two offsets, as a view on the buffer.
+
+            Args:
+                start_frame (int): The first sample offset.
+                end_frame (int): The sample offset after the last one.
+
+            Returns:
+                np.ndarray: The samples of shape (frames, channels).
+        """
+        return self.samples[start_frame:end_frame]
+
+    def detect_silences(self, start_frame, end_frame, time, decibel="-23dB"):
+        """
+            Detect silences between two offsets with the numpy engine.
+
+            Args:
+                start_frame (int): The first sample offset.
+                end_frame (int): The sample offset after the last one.
+                time (float): Minimum duration of a silence, in seconds.
+                decibel (str): Level under which the audio is considered silent.
+
+            Returns:
+                list: A list of tuples containing the start and end times of detected silences, relative to start_frame, or None.
+        """
+        return silence_utils.detect_silences_in_samples(self.view(start_frame, end_frame), self.sample_rate, self.sample_width, time, decibel)
+
+    def search_silences(self, start_frame, end_frame, time, decibel="-23dB", min_clip=0.6, max_clip=11):
+        """
+            Search the silence thresholds that best cut the samples between two offsets into usable clips.
+
+            Args:
+                start_frame (int): The first sample offset.
+                end_frame (int): The sample offset after the last one.
+                time (float): The silence duration the search starts from, in seconds.
+                decibel (str): The silence level the search starts from.
+                min_clip (float): The shortest usable clip, in seconds.
+                max_clip (float): The longest usable clip, in seconds.
+
+            Returns:
+                tuple: The silences relative to start_frame, the duration and the level used, or None.
+        """
+        return silence_utils.search_silence_thresholds(self.view(start_frame, end_frame), self.sample_rate, self.sample_width,
+                                                       time, decibel, min_clip, max_clip)
+
+    def to_segment(self, start_frame, end_frame):
+        """
+            Build a pydub AudioSegment holding only the samples between two offsets.
+
+            Args:
+                start_frame (int): The first sample offset.
+                end_frame (int): The sample offset after the last one.
+
+            Returns:
+                AudioSegment: The audio of that slice, ready to be exported.
+        """
+        return AudioSegment(
+            data=np.ascontiguousarray(self.view(start_frame, end_frame)).tobytes(),
+            sample_width=self.sample_width,
+            frame_rate=self.sample_rate,
+            channels=self.channels
+        )
+
+
+def to_whisper_input(segment):
+    """
+        Convert an AudioSegment into the in-memory format Whisper's transcribe accepts, so no file is needed.
+
+        Args:
+            segment (AudioSegment): The audio to transcribe.
+
+        Returns:
+            np.ndarray: Mono float32 samples at 16 kHz, between -1 and 1.
+    """
+    segment = segment.set_channels(1).set_frame_rate(WHISPER_SAMPLE_RATE).set_sample_width(2)
+    return silence_utils.segment_to_samples(segment)[:, 0].astype(np.float32) / 32768.0
+
+
+def find_wav_data(path):
+    """
+        Locate the raw PCM data inside a WAV file by walking its RIFF chunks.
+
+        Args:
+            path (str): The path to the WAV file.
+
+        Returns:
+            dict: The offset and size of the data chunk with the sample rate, channels and sample width,
+                  or None if the file is not a plain 16 or 32 bit PCM WAV.
+    """
+
+    with open(path, 'rb') as file:
+        riff_header = file.read(12)
+        if len(riff_header) < 12 or riff_header[:4] != b'RIFF' or riff_header[8:12] != b'WAVE':
+            return None
+
+        wav_format = None
+
+        # Each chunk starts with a 4 bytes identifier and its size, chunks are padded to an even size
+        while chunk_header := file.read(8):
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+
+            if chunk_id == b'fmt ':
+                format_tag, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', file.read(16))
+                file.seek(chunk_size - 16 + chunk_size % 2, os.SEEK_CUR)
+                wav_format = {'format_tag': format_tag, 'channels': channels, 'sample_rate': sample_rate, 'sample_width': bits // 8}
+
+            elif chunk_id == b'data':
+                # Only integer PCM with a signed sample type can be mapped as is (8 bit WAV is unsigned)
+                if wav_format is None or wav_format['format_tag'] != 1 or wav_format['sample_width'] not in (2, 4):
+                    return None
+                data_size = min(chunk_size, os.path.getsize(path) - file.tell())
+                return {'offset': file.tell(), 'size': data_size, **wav_format}
+
+            else:
+                file.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+    return None
+
+
+def map_pcm(path, offset, size, sample_rate, channels, sample_width):
+    """
+        Map raw PCM samples stored in a file, so that they are only read from disk when accessed.
+
+        Args:
+            path (str): The path to the file holding the samples.
+            offset (int): The byte offset of the first sample.
+            size (int): The number of bytes of samples.
+            sample_rate (int): The sample rate of the audio.
+            channels (int): The number of channels.
+            sample_width (int): The number of bytes per sample.
+
+        Returns:
+            PCMBuffer: The buffer backed by the memory-mapped file.
+    """
+
+    dtype = {2: np.int16, 4: np.int32}[sample_width]
+    frame_count = size // (channels * sample_width)
+
+    # numpy cannot map an empty region
+    if frame_count == 0:
+        return PCMBuffer(np.zeros((0, channels), dtype=dtype), sample_rate, sample_width)
+
+    samples = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(frame_count, channels))
+    return PCMBuffer(samples, sample_rate, sample_width)
+
+
+def get_cache_paths(filepath, cache_folder):
+    """
+        Get the paths of the PCM cache and its description for a source file.
+
+        Args:
+            filepath (str): The path to the source audio.
+            cache_folder (str): The folder holding the caches.
+
+        Returns:
+            tuple: The path of the raw PCM file and the path of its JSON description.
+    """
+
+    # The absolute path is hashed so that sources with the same name in different folders don't collide
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    path_hash = hashlib.sha1(os.path.abspath(filepath).encode('utf-8')).hexdigest()[:10]
+    cache_name = os.path.join(cache_folder, f'{name}_{path_hash}')
+    return f'{cache_name}.pcm', f'{cache_name}.json'
+
+
+def load_pcm_cache(filepath, cache_folder):
+    """
+        Get the samples of a source audio as a memory-mapped buffer, decoding it to a raw cache only once.
+        PCM WAV sources are mapped in place and need no cache at all.
+
+        Args:
+            filepath (str): The path to the source audio.
+            cache_folder (str): The folder holding the caches.
+
+        Returns:
+            PCMBuffer: The buffer backed by the memory-mapped samples.
+    """
+
+    if filepath.lower().endswith('.wav') and (wav_data := find_wav_data(filepath)):
+        return map_pcm(filepath, wav_data['offset'], wav_data['size'], wav_data['sample_rate'], wav_data['channels'], wav_data['sample_width'])
+
+    pcm_path, info_path = get_cache_paths(filepath, cache_folder)
+    source_stat = os.stat(filepath)
+
+    # The cache is reused as long as the source has not changed since it was decoded
+    if os.path.exists(pcm_path) and os.path.exists(info_path):
+        with open(info_path, 'r') as info_file:
+            info = json.load(info_file)
+        if info['source_size'] == source_stat.st_size and info['source_mtime'] == source_stat.st_mtime:
+            return map_pcm(pcm_path, 0, os.path.getsize(pcm_path), info['sample_rate'], info['channels'], 2)
+
+    os.makedirs(cache_folder, exist_ok=True)
+
+    # Probing the source for its sample rate and channels, which the raw cache does not store
+    audio_stream = next(stream for stream in mediainfo_json(filepath)['streams'] if stream['codec_type'] == 'audio')
+    sample_rate = int(audio_stream['sample_rate'])
+    channels = int(audio_stream['channels'])
+
+    # ffmpeg streams the decoded samples straight to disk, the audio never goes through our memory.
+    # We write to a temporary name first so that an interrupted decode never leaves a truncated cache behind.
+    partial_path = f'{pcm_path}.part'
+    command = ["ffmpeg", "-y", "-v", "error", "-i", filepath, "-vn", "-f", "s16le", "-acodec", "pcm_s16le",
+               "-ar", str(sample_rate), "-ac", str(channels), partial_path]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f'Could not decode {filepath}: {result.stderr.decode("utf-8", "ignore")}')
+    os.replace(partial_path, pcm_path)
+
+    with open(info_path, 'w') as info_file:
+        json.dump({'sample_rate': sample_rate, 'channels': channels,
+                   'source_size': source_stat.st_size, 'source_mtime': source_stat.st_mtime}, info_file, indent=4)
+
+    return map_pcm(pcm_path, 0, os.path.getsize(pcm_path), sample_rate, channels, 2)
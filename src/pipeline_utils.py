@@ -0,0 +1,252 @@
+import queue
+import threading
+import time
+
+
+# Marker put in a stage queue to tell one of its workers to stop
+STOP = object()
+
+
+class PipelineStage():
+    """
+        Class for one stage of a pipeline: a pool of worker threads taking items from a bounded queue,
+        processing them, and handing the results to the next stage.
+    """
+
+    def __init__(self, name, function, workers=1, queue_size=32, batch_size=1, max_wait=0.0):
+        """
+            Initialize the stage. Its workers are started by the pipeline.
+
+            Args:
+                name (str): The name of the stage, used in the statistics.
+                function (callable): Called with one item, or with a list of items when batch_size is above 1.
+                                     Returns the processed item (or the list of processed items), None to drop it.
+                workers (int): The number of worker threads of the stage.
+                queue_size (int): The number of items that can wait in front of the stage.
+                batch_size (int): The maximum number of items processed together.
+                max_wait (float): The longest time a batch waits to fill up, in seconds.
+        """
+        self.name = name
+        self.function = function
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.next_stage = None
+        self.threads = []
+
+        # Statistics, updated by every worker
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.errors = []
+
+        # Depth of the queue, sampled each time an item is queued: a stage whose queue stays full is the bottleneck
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.peak_depth = 0
+
+    def start(self):
+        """
+            Start the worker threads of the stage.
+        """
+        for index in range(self.workers):
+            thread = threading.Thread(target=self.run, name=f'{self.name}-{index}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def put(self, item):
+        """
+            Queue an item for the stage, waiting if the queue is full.
+
+            Args:
+                item: The item to process.
+        """
+        self.queue.put(item)
+
+        depth = self.queue.qsize()
+        with self.lock:
+            self.depth_samples += 1
+            self.depth_total += depth
+            self.peak_depth = max(self.peak_depth, depth)
+
+    def next_batch(self):
+        """
+            Wait for the next items to process.
+
+            Returns:
+                tuple: The list of items, and whether a stop marker was met.
+        """
+        item = self.queue.get()
+        if item is STOP:
+            return [], True
+
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.batch_size:
+            try:
+                item = self.queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is STOP:
+                return batch, True
+            batch.append(item)
+
+        return batch, False
+
+    def run(self):
+        """
+            Worker loop of the stage.
+        """
+        stop = False
+
+        while not stop:
+            waiting_since = time.monotonic()
+            batch, stop = self.next_batch()
+            started = time.monotonic()
+
+            if not batch:
+                break
+
+            # Anything raised is recorded, KeyboardInterrupt and SystemExit included: the items of the batch are lost, so the run
+            # must not be reported complete. The worker goes on, so that the queue keeps draining and closing never blocks.
+            try:
+                results = self.function(batch) if self.batch_size > 1 else [self.function(batch[0])]
+            except BaseException as error:
+                print(f'Stage {self.name} failed on {len(batch)} items: {error!r}')
+                results = []
+                with self.lock:
+                    self.errors.append(error)
+
+            with self.lock:
+                self.processed += len(batch)
+                self.wait_seconds += started - waiting_since
+                self.busy_seconds += time.monotonic() - started
+
+            # Handing the results downstream. This blocks when the next stage is full, which slows this one down in turn
+            if self.next_stage is not None:
+                for result in results:
+                    if result is not None:
+                        self.next_stage.put(result)
+
+    def close(self):
+        """
+            Stop the workers once every item queued before has been processed.
+        """
+        for _ in self.threads:
+            self.queue.put(STOP)
+        for thread in self.threads:
+            thread.join()
+
+
+class Pipeline():
+    """
+        Class to chain stages with bounded queues, so that items stream through them
+        and every stage works at the same time as the others.
+    """
+
+    def __init__(self, stages, source_name='source'):
+        """
+            Initialize the pipeline and start its stages.
+
+            Args:
+                stages (list): The PipelineStage objects, in order.
+                source_name (str): The name given in the statistics to the code submitting the items.
+        """
+        self.stages = stages
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next_stage = next_stage
+        for stage in stages:
+            stage.start()
+
+        self.source_name = source_name
+        self.submitted = 0
+        self.blocked_seconds = 0.0
+        self.started = time.monotonic()
+        self.source_done = None
+        self.finished = None
+
+    def submit(self, item):
+        """
+            Feed an item to the first stage, waiting if it is full.
+
+            Args:
+                item: The item to process.
+        """
+        waiting_since = time.monotonic()
+        self.stages[0].put(item)
+        self.blocked_seconds += time.monotonic() - waiting_since
+        self.submitted += 1
+
+    def close(self):
+        """
+            Wait for every submitted item to go through the pipeline, then stop the stages.
+
+            Returns:
+                list: The (stage name, error) pairs of the items that failed.
+        """
+        self.source_done = time.monotonic()
+
+        # The stages are closed in order: a stage only stops once everything upstream has been handed to it
+        for stage in self.stages:
+            stage.close()
+        self.finished = time.monotonic()
+
+        return [(stage.name, error) for stage in self.stages for error in stage.errors]
+
+    def stats(self):
+        """
+            Get the current statistics of every stage, to find which one is the bottleneck.
+
+            Returns:
+                list: One dictionary per stage, with its current, mean and peak queue depth, processed items, busy and waiting time, and throughput.
+        """
+        now = time.monotonic()
+        elapsed = max((self.finished or now) - self.started, 1e-9)
+
+        # The source is busy whenever it is not blocked on the first queue, until it closes the pipeline
+        source_busy = (self.source_done or now) - self.started - self.blocked_seconds
+
+        stats = [{
+            'stage': self.source_name,
+            'workers': 1,
+            'queue_depth': 0,
+            'mean_queue_depth': 0.0,
+            'peak_queue_depth': 0,
+            'processed': self.submitted,
+            'busy_seconds': source_busy,
+            'wait_seconds': self.blocked_seconds,
+            'throughput': self.submitted / elapsed,
+        }]
+
+        for stage in self.stages:
+            with stage.lock:
+                stats.append({
+                    'stage': stage.name,
+                    'workers': stage.workers,
+                    'queue_depth': stage.queue.qsize(),
+                    'mean_queue_depth': stage.depth_total / stage.depth_samples if stage.depth_samples else 0.0,
+                    'peak_queue_depth': stage.peak_depth,
+                    'processed': stage.processed,
+                    'busy_seconds': stage.busy_seconds,
+                    'wait_seconds': stage.wait_seconds,
+                    'throughput': stage.processed / elapsed,
+                })
+
+        return stats
+
+    def report(self):
+        """
+            Describe the statistics of every stage in a human readable way.
+
+            Returns:
+                list: One line per stage.
+        """
+        lines = []
+        for stage in self.stats():
+            lines.append(f"{stage['stage']}: {stage['processed']} items with {stage['workers']} workers, "
+                         f"{stage['busy_seconds']:.1f}s busy, {stage['wait_seconds']:.1f}s waiting, {stage['throughput']:.2f} items/s, "
+                         f"{stage['mean_queue_depth']:.1f} queued on average, {stage['peak_queue_depth']} at most")
+        return lines
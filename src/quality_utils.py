@@ -0,0 +1,405 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from pydub import AudioSegment
+import conform_utils
+import metrics_utils
+import pcm_utils
+import silence_utils
+
+
+# Path of the quality metrics of a clip folder, in its metrics folder so that the clips stay the only files next to each other
+QUALITY_PATH = os.path.join(metrics_utils.METRICS_FOLDER, 'quality.npz')
+
+# Extensions of the clips measured, and folders skipped when looking for them: the metrics themselves and the backups of a reindex
+QUALITY_EXTENSIONS = ('.wav', '.mp3')
+QUALITY_SKIPPED_FOLDERS = (metrics_utils.METRICS_FOLDER, 'backup')
+
+# Number of clips measured by a worker at once, so that the clips and their metrics cross the process boundary in large batches
+QUALITY_BATCH_SIZE = 256
+
+# Level under which the start and the end of a clip count as silence, in dBFS
+QUALITY_SILENCE_DECIBEL = -40
+
+# Percentiles of the energy envelope standing for the level of the speech and of the noise floor, to estimate the SNR
+SNR_SPEECH_PERCENTILE = 95
+SNR_NOISE_PERCENTILE = 10
+
+# The numeric columns of the metrics file, in the order they are reported
+QUALITY_COLUMNS = ('duration', 'sample_rate', 'channels', 'clipping_ratio', 'snr_db', 'loudness_lufs', 'peak_dbfs', 'dc_offset',
+                   'leading_silence', 'trailing_silence')
+
+# Clips worth a look in the review tab: each column with the lowest and highest value it should have, None for no limit
+QUALITY_LIMITS = {
+    'clipping_ratio': (None, 0.001),
+    'snr_db': (20.0, None),
+    'loudness_lufs': (-40.0, -10.0),
+    'dc_offset': (None, 0.01),
+    'leading_silence': (None, 1.0),
+    'trailing_silence': (None, 1.0),
+}
+
+
+def read_clip(path):
+    """
+        Decode a clip once. PCM WAV clips are read straight from the file, the other formats through pydub.
+
+        Args:
+            path (str): The path of the clip.
+
+        Returns:
+            tuple: The integer samples of shape (frames, channels), the sample rate and the sample width.
+    """
+    if path.lower().endswith('.wav') and (wav_data := pcm_utils.find_wav_data(path)):
+        dtype = {2: np.int16, 4: np.int32}[wav_data['sample_width']]
+        count = wav_data['size'] // wav_data['sample_width'] // wav_data['channels'] * wav_data['channels']
+        samples = np.fromfile(path, dtype=dtype, count=count, offset=wav_data['offset'])
+        return samples.reshape(-1, wav_data['channels']), wav_data['sample_rate'], wav_data['sample_width']
+
+    segment = AudioSegment.from_file(path)
+    return silence_utils.segment_to_samples(segment), segment.frame_rate, segment.sample_width
+
+
+def measure_samples(samples, sample_rate, sample_width):
+    """
+        Measure the quality of a clip.
+
+        Args:
+            samples (np.ndarray): Integer PCM samples of shape (frames, channels).
+            sample_rate (int): The sample rate of the clip.
+            sample_width (int): The number of bytes per sample.
+
+        Returns:
+            dict: The value of each column of QUALITY_COLUMNS, NaN when it can't be measured, such as the loudness of a silent clip.
+    """
+    full_scale = float(2 ** (8 * sample_width - 1))
+    duration = len(samples) / sample_rate
+
+    if not len(samples):
+        return dict(dict.fromkeys(QUALITY_COLUMNS, np.nan), duration=0.0, sample_rate=sample_rate, channels=samples.shape[1])
+
+    # Clipped samples sit at either end of the integer range
+    limits = np.iinfo(samples.dtype)
+    clipped = np.count_nonzero((samples >= limits.max) | (samples <= limits.min))
+    peak = max(int(samples.max()), -int(samples.min())) / full_scale
+
+    audio = samples / full_scale
+    dc_offset = float(np.abs(audio.mean(axis=0)).max())
+
+    # The same energy envelope the split tab detects silences with
+    envelope = silence_utils.compute_energy_envelope(samples, sample_rate, sample_width)
+    frame_duration = max(1, int(sample_rate * silence_utils.DEFAULT_FRAME_MS / 1000)) / sample_rate
+    active = np.flatnonzero(envelope > QUALITY_SILENCE_DECIBEL)
+    if len(active):
+        leading_silence = active[0] * frame_duration
+        trailing_silence = max(0.0, duration - (active[-1] + 1) * frame_duration)
+    else:
+        leading_silence = trailing_silence = duration
+
+    # Digital silence gives -inf frames, which would hide the noise floor: they are floored at the quietest 16 bit level
+    floor = 20 * np.log10(1 / 32768)
+    snr = np.diff(np.percentile(np.maximum(envelope, floor), [SNR_NOISE_PERCENTILE, SNR_SPEECH_PERCENTILE]))[0]
+    fft_length = conform_utils.get_fft_length(len(audio))
+    loudness = conform_utils.measure_loudness(np.fft.rfft(audio, fft_length, axis=0), len(audio), sample_rate, fft_length)
+
+    return {
+        'duration': duration,
+        'sample_rate': sample_rate,
+        'channels': samples.shape[1],
+        'clipping_ratio': clipped / samples.size,
+        'snr_db': float(snr),
+        'loudness_lufs': loudness if loudness is not None else np.nan,
+        'peak_dbfs': 20 * np.log10(peak) if peak > 0 else np.nan,
+        'dc_offset': dc_offset,
+        'leading_silence': leading_silence,
+        'trailing_silence': trailing_silence,
+    }
+
+
+def measure_clips(paths):
+    """
+        Measure a batch of clips, in the process of a worker. A clip that can't be decoded doesn't stop the others.
+
+        Args:
+            paths (list): The paths of the clips.
+
+        Returns:
+            tuple: The metrics of each measured clip as columns, with their paths, and the paths and errors of the other clips.
+    """
+    columns = {column: [] for column in ('path',) + QUALITY_COLUMNS}
+    errors = []
+
+    for path in paths:
+        try:
+            metrics = measure_samples(*read_clip(path))
+        except Exception as error:
+            errors.append((path, f'{type(error).__name__}: {error}'))
+            continue
+
+        columns['path'].append(path)
+        for column in QUALITY_COLUMNS:
+            columns[column].append(metrics[column])
+
+    return columns, errors
+
+
+def get_clips(folder):
+    """
+        List the clips of a folder and of its subfolders, such as the Usable and NonUsable folders of every split audio.
+
+        Args:
+            folder (str): The folder holding the clips.
+
+        Returns:
+            list: The paths of the clips, sorted.
+    """
+    clips = []
+
+    for root, folders, files in os.walk(folder):
+        folders[:] = [name for name in folders if not name.startswith('.') and name not in QUALITY_SKIPPED_FOLDERS]
+        clips.extend(os.path.join(root, name) for name in files if name.lower().endswith(QUALITY_EXTENSIONS))
+
+    return sorted(clips)
+
+
+def measure_folder(folder, workers=1, progress=None, batch_size=QUALITY_BATCH_SIZE):
+    """
+        Measure the quality of every clip of a folder, in batches spread over a process pool, and write the metrics file.
+
+        Args:
+            folder (str): The folder holding the clips.
+            workers (int): The number of processes measuring batches at the same time.
+            progress (callable, optional): Called with the completed fraction and a description after each batch, like gr.Progress.
+            batch_size (int): The number of clips measured by a worker at once.
+
+        Returns:
+            dict: The clips, the errors of the ones that could not be measured, the path of the metrics file,
+                  and the metrics summary and path of the run.
+    """
+    clips = get_clips(folder)
+    batches = [clips[start:start + batch_size] for start in range(0, len(clips), batch_size)]
+    metrics = metrics_utils.RunMetrics('quality', progress, total=len(clips))
+
+    columns = {column: [] for column in ('path',) + QUALITY_COLUMNS}
+    errors = []
+
+    def collect(batch, result):
+        batch_columns, batch_errors = result
+        for column, values in batch_columns.items():
+            columns[column].extend(values)
+        errors.extend(batch_errors)
+        metrics.record(clips=len(batch), audio_seconds=float(sum(batch_columns['duration'])), failed=len(batch_errors))
+        metrics.advance(f'{len(columns["path"])} of {len(clips)} clips measured', len(batch))
+
+    workers = max(1, int(workers or 1))
+    with metrics.stage('measure', items=len(clips)):
+        if workers > 1 and len(batches) > 1:
+            # Spawned workers start from a clean interpreter, like the ones of the split tab
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(workers, len(batches)), mp_context=context) as executor:
+                futures = {executor.submit(measure_clips, batch): batch for batch in batches}
+                for future in as_completed(futures):
+                    collect(futures[future], future.result())
+        else:
+            for batch in batches:
+                collect(batch, measure_clips(batch))
+
+    # The batches finish in any order, the clips are stored sorted by path
+    order = np.argsort(columns['path'])
+    table = {'path': np.array([os.path.relpath(path, folder) for path in columns['path']], dtype=str)[order]}
+    for column in QUALITY_COLUMNS:
+        table[column] = np.asarray(columns[column], dtype=np.float64)[order]
+
+    quality_path = os.path.join(folder, QUALITY_PATH)
+    save_quality(quality_path, table)
+
+    metrics.finish()
+    metrics_path = metrics.save(folder)
+    return {'clips': clips, 'errors': errors, 'table': table, 'quality_path': quality_path,
+            'metrics': metrics.summary(), 'metrics_path': metrics_path}
+
+
+def save_quality(quality_path, table):
+    """
+        Write the quality metrics as one array per column. The file is replaced atomically, so that a crash while saving leaves the previous one.
+
+        Args:
+            quality_path (str): The path of the metrics file.
+            table (dict): The path of each clip, relative to the measured folder, and each column of QUALITY_COLUMNS.
+    """
+    os.makedirs(os.path.dirname(quality_path), exist_ok=True)
+    temporary_path = f'{quality_path}.part'
+
+    # np.savez adds its extension to paths, but not to file handles
+    with open(temporary_path, 'wb') as quality_file:
+        np.savez(quality_file, **table)
+
+    os.replace(temporary_path, quality_path)
+
+
+def load_quality(folder):
+    """
+        Load the quality metrics of a clip folder.
+
+        Args:
+            folder (str): The folder the clips were measured in.
+
+        Returns:
+            dict: The path of each clip and each column of QUALITY_COLUMNS, as arrays. None if the folder was never measured.
+    """
+    quality_path = os.path.join(folder, QUALITY_PATH)
+    if not os.path.exists(quality_path):
+        return None
+
+    with np.load(quality_path) as data:
+        return {column: data[column] for column in data.files}
+
+
+def find_clip_quality(path, tables):
+    """
+        Find the quality metrics of a clip, in the closest folder above it that was measured: the clips may have been measured
+        from the dataset's audio folder, or from any folder holding it, such as the output folder of the split.
+
+        Args:
+            path (str): The path of the clip.
+            tables (dict): The quality metrics already loaded, by measured folder. The ones loaded here are added to it.
+
+        Returns:
+            tuple: The quality metrics of the folder, and the path of the clip relative to it. None if no folder above the clip was measured.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    while True:
+        if folder not in tables:
+            tables[folder] = load_quality(folder)
+        if tables[folder] is not None:
+            return tables[folder], os.path.relpath(os.path.abspath(path), folder)
+
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            return None
+        folder = parent
+
+
+def flag_clips(table, limits=QUALITY_LIMITS):
+    """
+        Find the clips whose metrics are out of their limits.
+
+        Args:
+            table (dict): The quality metrics, as returned by load_quality.
+            limits (dict): The lowest and highest value of each column, None for no limit.
+
+        Returns:
+            dict: For each column with limits, a boolean array telling which clips are out of them. A NaN is never out of them.
+    """
+    flags = {}
+    for column, (lowest, highest) in limits.items():
+        values = table[column]
+        flags[column] = np.zeros(len(values), dtype=bool)
+        if lowest is not None:
+            flags[column] |= values < lowest
+        if highest is not None:
+            flags[column] |= values > highest
+    return flags
+
+
+def sort_clips(table, column, descending=False, flagged_only=False):
+    """
+        Order the clips on a column, such as the worst SNR first, to review them in that order.
+
+        Args:
+            table (dict): The quality metrics, as returned by load_quality.
+            column (str): The column to sort on.
+            descending (bool): Whether the highest values come first.
+            flagged_only (bool): Whether to keep only the clips out of QUALITY_LIMITS.
+
+        Returns:
+            np.ndarray: The positions of the clips in the table, in order. The clips without a value come last.
+    """
+    values = table[column]
+    order = np.argsort(-values if descending else values, kind='stable')
+
+    if flagged_only:
+        flagged = np.any(list(flag_clips(table).values()), axis=0)
+        order = order[flagged[order]]
+
+    return order
+
+
+def describe_clip(table, path):
+    """
+        Describe the quality of a single clip, such as the one shown in the review tab.
+
+        Args:
+            table (dict): The quality metrics, as returned by load_quality.
+            path (str): The path of the clip, relative to the measured folder.
+
+        Returns:
+            str: The metrics of the clip and the ones out of their limits, or None if the clip was not measured.
+    """
+    positions = np.flatnonzero(table['path'] == path)
+    if not len(positions):
+        return None
+
+    position = positions[0]
+    flags = [column for column, flagged in flag_clips(table).items() if flagged[position]]
+    values = ', '.join(f'{column} {table[column][position]:.4g}' for column in QUALITY_COLUMNS[3:])
+    return f'Quality: {values}' + (f'\nOut of limits: {", ".join(flags)}' if flags else '')
+
+
+def format_quality_report(result, worst=10):
+    """
+        Describe the quality of a clip folder: the spread of each metric, the clips out of limits, and the worst ones.
+
+        Args:
+            result (dict): The result of measure_folder.
+            worst (int): The number of worst clips listed for each metric out of limits.
+
+        Returns:
+            str: The report.
+    """
+    table = result['table']
+    lines = [f"{len(table['path'])} clips measured, metrics saved to {result['quality_path']}", '',
+             f"{'Metric':<18} {'p10':>9} {'p50':>9} {'p90':>9} {'Out of limits':>14}"]
+
+    flags = flag_clips(table)
+    for column in QUALITY_COLUMNS[3:]:
+        values = table[column][~np.isnan(table[column])]
+        percentiles = np.percentile(values, [10, 50, 90]) if len(values) else [np.nan] * 3
+        flagged = f'{int(flags[column].sum())}' if column in flags else ''
+        lines.append(f"{column:<18} {percentiles[0]:>9.4g} {percentiles[1]:>9.4g} {percentiles[2]:>9.4g} {flagged:>14}")
+
+    for column, (lowest, highest) in QUALITY_LIMITS.items():
+        if not flags[column].any():
+            continue
+        # The clips furthest from the limit come first
+        order = sort_clips(table, column, descending=highest is not None)
+        order = order[flags[column][order]][:worst]
+        lines += ['', f'Worst {column}:'] + [f"  {table['path'][position]}: {table[column][position]:.4g}" for position in order]
+
+    if result['errors']:
+        lines += ['', f"{len(result['errors'])} clips could not be measured:"] + [f'  {path}: {error}' for path, error in result['errors']]
+
+    return "\n".join(lines)
+
+
+def quality_main(folder, workers=1, progress=None):
+    """
+        Measure the quality of every clip of a folder and report it.
+
+        Args:
+            folder (str): The folder holding the clips.
+            workers (int): The number of processes measuring batches at the same time.
+            progress (callable, optional): Called with the completed fraction and a description after each batch, like gr.Progress.
+
+        Returns:
+            str: The report, or the error preventing it.
+    """
+    if not folder or not os.path.isdir(folder):
+        return 'Choose a folder of clips to measure.'
+
+    result = measure_folder(folder, workers, progress)
+    if not result['clips']:
+        return f'No clips were found in {folder}.'
+
+    return format_quality_report(result) + f"\n\nMeasured in {result['metrics']['wall_seconds']:.1f}s, run metrics saved to {result['metrics_path']}"
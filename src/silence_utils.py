@@ -0,0 +1,535 @@
+import glob
+import os
+import numpy as np
+import fingerprint_utils
+
+
+# Duration of one analysis frame of the energy envelope, in milliseconds
+DEFAULT_FRAME_MS = 10
+
+# Number of envelope frames converted to float at once when computing the envelope
+ENVELOPE_BLOCK_FRAMES = 60000
+
+# Search grid of the adaptive threshold search: number of silence durations tried, shortest duration tried in seconds,
+# and increases of the silence level tried, in dB
+ADAPTIVE_DURATION_STEPS = 24
+ADAPTIVE_MIN_DURATION = 0.05
+ADAPTIVE_DECIBEL_STEPS = (0, 3, 6, 9)
+
+# Silence levels stored in a silence index, in dB, and shortest silence stored, in seconds
+INDEX_DECIBELS = tuple(range(-70, -4))
+INDEX_MIN_SILENCE = 0.02
+
+
+def parse_decibel(decibel):
+    """
+        Convert a decibel threshold into a float, accepting the ffmpeg notation.
+
+        Args:
+            decibel (str | float): The threshold, either as a number or as an ffmpeg string like "-23dB".
+
+        Returns:
+            float: The threshold in dBFS.
+    """
+
+    if isinstance(decibel, str):
+        decibel = decibel.strip().lower().removesuffix('db')
+    return float(decibel)
+
+
+def segment_to_samples(segment):
+    """
+        Get the raw PCM samples of a pydub AudioSegment as a NumPy array, without copying.
+
+        Args:
+            segment (AudioSegment): The decoded audio.
+
+        Returns:
+            np.ndarray: An integer array of shape (frames, channels).
+    """
+
+    dtype = {1: np.int8, 2: np.int16, 4: np.int32}[segment.sample_width]
+    samples = np.frombuffer(segment.raw_data, dtype=dtype)
+    return samples.reshape(-1, segment.channels)
+
+
+def compute_energy_envelope(samples, sample_rate, sample_width, frame_ms=DEFAULT_FRAME_MS):
+    """
+        Compute the RMS energy of consecutive frames of audio, in dBFS.
+
+        Args:
+            samples (np.ndarray): Integer PCM samples of shape (frames, channels).
+            sample_rate (int): The sample rate of the audio.
+            sample_width (int): The number of bytes per sample.
+            frame_ms (int): The duration of an analysis frame, in milliseconds.
+
+        Returns:
+            np.ndarray: One dBFS value per frame. The last frame may be shorter than the others.
+    """
+
+    frame_length = max(1, int(sample_rate * frame_ms / 1000))
+    full_scale = float(2 ** (8 * sample_width - 1))
+    total_frames = len(samples)
+    frame_count = -(-total_frames // frame_length)
+    mean_square = np.empty(frame_count, dtype=np.float32)
+
+    # The samples are converted to float one block at a time, so that long files never need a full float copy in memory
+    block_length = frame_length * ENVELOPE_BLOCK_FRAMES
+
+    for block_start in range(0, total_frames, block_length):
+        block = np.asarray(samples[block_start:block_start + block_length], dtype=np.float32) / full_scale
+        first_frame = block_start // frame_length
+
+        # Whole frames are reshaped and averaged in one go
+        whole = len(block) // frame_length
+        if whole:
+            frames = block[:whole * frame_length].reshape(whole, -1)
+            mean_square[first_frame:first_frame + whole] = np.square(frames).mean(axis=1)
+
+        # The trailing partial frame, only present at the very end of the audio, is averaged over its real length
+        if len(block) % frame_length:
+            mean_square[first_frame + whole] = np.square(block[whole * frame_length:]).mean()
+
+    # Guarding against log(0) for digital silence
+    return 10 * np.log10(np.maximum(mean_square, 1e-12))
+
+
+def find_silences(envelope, frame_duration, time, decibel="-23dB", total_duration=None):
+    """
+        Find the runs of quiet frames in an energy envelope.
+
+        Args:
+            envelope (np.ndarray): The dBFS value of each frame.
+            frame_duration (float): The duration of one frame, in seconds.
+            time (float): Minimum duration of a silence, in seconds.
+            decibel (str | float): Level under which a frame is considered silent.
+            total_duration (float, optional): The real duration of the audio, used to clamp the last silence end.
+
+        Returns:
+            list: A list of tuples containing the start and end times of detected silences, or None if no silence was found.
+    """
+
+    run_starts, run_ends = get_quiet_runs(envelope, decibel)
+
+    # Keeping only the runs that are long enough, with a small tolerance for float rounding
+    long_enough = (run_ends - run_starts) * frame_duration >= time - 1e-9
+    starts = run_starts[long_enough] * frame_duration
+    ends = run_ends[long_enough] * frame_duration
+
+    if total_duration is not None:
+        ends = np.minimum(ends, total_duration)
+
+    if len(starts) == 0:
+        return None
+
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def detect_silences_in_samples(samples, sample_rate, sample_width, time, decibel="-23dB", frame_ms=DEFAULT_FRAME_MS):
+    """
+        Detect silences in already decoded audio, mirroring the output of ffmpeg's silencedetect filter.
+
+        Args:
+            samples (np.ndarray): Integer PCM samples of shape (frames, channels).
+            sample_rate (int): The sample rate of the audio.
+            sample_width (int): The number of bytes per sample.
+            time (float): Minimum duration of a silence, in seconds.
+            decibel (str | float): Level under which the audio is considered silent.
+            frame_ms (int): The duration of an analysis frame, in milliseconds.
+
+        Returns:
+            list: A list of tuples containing the start and end times of detected silences, or None if no silence was found.
+    """
+
+    envelope = compute_energy_envelope(samples, sample_rate, sample_width, frame_ms)
+    frame_duration = max(1, int(sample_rate * frame_ms / 1000)) / sample_rate
+    return find_silences(envelope, frame_duration, time, decibel, total_duration=len(samples) / sample_rate)
+
+
+def get_quiet_runs(envelope, decibel):
+    """
+        Find every run of quiet frames in an energy envelope, whatever its length.
+
+        Args:
+            envelope (np.ndarray): The dBFS value of each frame.
+            decibel (str | float): Level under which a frame is considered silent.
+
+        Returns:
+            tuple: The first frame and the frame after the last one of each run, as two arrays.
+    """
+    quiet = envelope < parse_decibel(decibel)
+
+    # The edges of the quiet runs are where the padded mask changes value
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], quiet, [False])).astype(np.int8)))
+    return edges[0::2], edges[1::2]
+
+
+def search_silence_thresholds(samples, sample_rate, sample_width, time_threshold, decibel="-23dB",
+                              min_clip=0.6, max_clip=11, frame_ms=DEFAULT_FRAME_MS):
+    """
+        Find the least aggressive silence thresholds that cut a segment into clips inside the [min_clip, max_clip] window.
+        The energy envelope is computed once, then many silence durations and levels are evaluated against it in memory.
+        If no thresholds give only valid clips, the ones keeping the most audio in valid clips are used.
+
+        Args:
+            samples (np.ndarray): Integer PCM samples of shape (frames, channels).
+            sample_rate (int): The sample rate of the audio.
+            sample_width (int): The number of bytes per sample.
+            time_threshold (float): The silence duration the search starts from, in seconds.
+            decibel (str | float): The silence level the search starts from.
+            min_clip (float): The shortest usable clip, in seconds.
+            max_clip (float): The longest usable clip, in seconds.
+            frame_ms (int): The duration of an analysis frame, in milliseconds.
+
+        Returns:
+            tuple: The list of (start, end) silences to cut at, the duration and the level used. None if no silence can split the segment.
+    """
+
+    envelope = compute_energy_envelope(samples, sample_rate, sample_width, frame_ms)
+    frame_duration = max(1, int(sample_rate * frame_ms / 1000)) / sample_rate
+    total_duration = len(samples) / sample_rate
+
+    # Candidates go from the least to the most aggressive: shorter silences first, then louder levels
+    durations = np.geomspace(time_threshold, max(ADAPTIVE_MIN_DURATION, 2 * frame_duration), ADAPTIVE_DURATION_STEPS)
+    base_decibel = parse_decibel(decibel)
+
+    best = None
+    best_usable = -1.0
+
+    for decibel_step in ADAPTIVE_DECIBEL_STEPS:
+        level = base_decibel + decibel_step
+        run_starts, run_ends = get_quiet_runs(envelope, level)
+
+        # Silences touching the edges of the segment would only cut off a sliver of silence
+        inner = (run_starts > 0) & (run_ends < len(envelope))
+        run_starts, run_ends = run_starts[inner], run_ends[inner]
+        run_lengths = (run_ends - run_starts) * frame_duration
+
+        for duration in durations:
+            selected = run_lengths >= duration - 1e-9
+            if not selected.any():
+                continue
+
+            # The clips we would get by cutting at the middle of every selected silence
+            midpoints = (run_starts[selected] + run_ends[selected]) / 2 * frame_duration
+            clip_lengths = np.diff(np.concatenate(([0.0], midpoints, [total_duration])))
+            valid = (clip_lengths >= min_clip) & (clip_lengths <= max_clip)
+
+            silences = lambda: list(zip((run_starts[selected] * frame_duration).tolist(),
+                                        np.minimum(run_ends[selected] * frame_duration, total_duration).tolist()))
+
+            if valid.all():
+                return silences(), float(duration), level
+
+            usable = clip_lengths[valid].sum()
+            if usable > best_usable:
+                best, best_usable = (silences(), float(duration), level), usable
+
+    # No thresholds give only valid clips: the caller goes on splitting the over-long clips of the best candidate.
+    # If no candidate gives any valid clip, the best one is the least aggressive that cuts at all, which still shortens the segment.
+    return best
+
+
+class SilenceIndex():
+    """
+        Class to store every quiet run of an audio, for a grid of silence levels, sorted by length.
+        The silences of any minimum duration are then found with a binary search, without decoding the audio again.
+    """
+
+    def __init__(self, decibels, offsets, starts, ends, lengths, depths, frame_duration, duration, fingerprint):
+        """
+            Initialize the index from its arrays.
+
+            Args:
+                decibels (np.ndarray): The silence levels of the grid, in dB.
+                offsets (np.ndarray): Where the runs of each level start in the run arrays, plus the total number of runs.
+                starts (np.ndarray): The start of each run, in seconds.
+                ends (np.ndarray): The end of each run, in seconds.
+                lengths (np.ndarray): The length of each run, in seconds. Sorted in ascending order within each level.
+                depths (np.ndarray): The mean level of each run, in dBFS.
+                frame_duration (float): The duration of an envelope frame, in seconds.
+                duration (float): The duration of the audio, in seconds.
+                fingerprint (str): The content fingerprint of the indexed file.
+        """
+        self.decibels = decibels
+        self.offsets = offsets
+        self.starts = starts
+        self.ends = ends
+        self.lengths = lengths
+        self.depths = depths
+        self.frame_duration = frame_duration
+        self.duration = duration
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, samples, sample_rate, sample_width, fingerprint, frame_ms=DEFAULT_FRAME_MS, envelope=None):
+        """
+            Build the index of decoded samples: the envelope is computed once, then the runs of every level are extracted from it.
+
+            Args:
+                samples (np.ndarray): Integer PCM samples of shape (frames, channels).
+                sample_rate (int): The sample rate of the audio.
+                sample_width (int): The number of bytes per sample.
+                fingerprint (str): The content fingerprint of the indexed file.
+                frame_ms (int): The duration of an analysis frame, in milliseconds.
+                envelope (np.ndarray, optional): The envelope of the samples, if the caller already computed it.
+
+            Returns:
+                SilenceIndex: The built index.
+        """
+        if envelope is None:
+            envelope = compute_energy_envelope(samples, sample_rate, sample_width, frame_ms)
+        frame_duration = max(1, int(sample_rate * frame_ms / 1000)) / sample_rate
+        duration = len(samples) / sample_rate
+
+        # The mean level of a run is computed from the cumulative sum of the envelope, for every run at once
+        cumulative = np.concatenate(([0.0], np.cumsum(envelope, dtype=np.float64)))
+
+        starts, ends, lengths, depths, offsets = [], [], [], [], [0]
+        for decibel in INDEX_DECIBELS:
+            run_starts, run_ends = get_quiet_runs(envelope, decibel)
+            run_lengths = (run_ends - run_starts) * frame_duration
+
+            # Very short runs are dropped to keep the index small, then the runs are sorted by length for the binary search
+            kept = run_lengths >= INDEX_MIN_SILENCE - 1e-9
+            order = np.argsort(run_lengths[kept], kind='stable')
+            starts.append(run_starts[kept][order] * frame_duration)
+            ends.append(np.minimum(run_ends[kept][order] * frame_duration, duration))
+            lengths.append(run_lengths[kept][order])
+            depths.append((cumulative[run_ends] - cumulative[run_starts])[kept][order] / np.maximum(1, run_ends - run_starts)[kept][order])
+            offsets.append(offsets[-1] + len(order))
+
+        return cls(np.array(INDEX_DECIBELS, dtype=np.float64), np.array(offsets, dtype=np.int64),
+                   np.concatenate(starts), np.concatenate(ends), np.concatenate(lengths), np.concatenate(depths),
+                   frame_duration, duration, fingerprint)
+
+    @classmethod
+    def load(cls, index_path):
+        """
+            Load an index saved with save.
+
+            Args:
+                index_path (str): The path of the index file.
+
+            Returns:
+                SilenceIndex: The loaded index.
+        """
+        with np.load(index_path) as data:
+            return cls(data['decibels'], data['offsets'], data['starts'], data['ends'], data['lengths'], data['depths'],
+                       float(data['frame_duration']), float(data['duration']), str(data['fingerprint']))
+
+    def save(self, index_path):
+        """
+            Save the index, through a temporary file so that an interrupted save never leaves a broken index.
+
+            Args:
+                index_path (str): The path of the index file.
+        """
+        partial_path = f'{index_path}.part'
+        with open(partial_path, 'wb') as index_file:
+            np.savez(index_file, decibels=self.decibels, offsets=self.offsets, starts=self.starts, ends=self.ends,
+                     lengths=self.lengths, depths=self.depths, frame_duration=self.frame_duration, duration=self.duration, fingerprint=self.fingerprint)
+        os.replace(partial_path, index_path)
+
+    def runs(self, decibel="-23dB"):
+        """
+            Get every silence of the closest level of the grid, sorted by length.
+
+            Args:
+                decibel (str | float): Level under which the audio is considered silent.
+
+            Returns:
+                tuple: The start and the end of each silence, in seconds, as two arrays.
+        """
+        level = int(np.argmin(np.abs(self.decibels - parse_decibel(decibel))))
+        first, last = self.offsets[level], self.offsets[level + 1]
+        return self.starts[first:last], self.ends[first:last]
+
+    def cut_candidates(self, decibel="-23dB", min_length=ADAPTIVE_MIN_DURATION):
+        """
+            List every pause that could be used as a cut point, as find_cut_candidates does from the envelope.
+
+            Args:
+                decibel (str | float): Level under which the audio is considered silent, the closest level of the grid being used.
+                min_length (float): The shortest pause kept, in seconds.
+
+            Returns:
+                tuple: The midpoint, length and mean level (in dBFS) of each pause, as three arrays sorted by midpoint.
+        """
+        level = int(np.argmin(np.abs(self.decibels - parse_decibel(decibel))))
+        first, last = self.offsets[level], self.offsets[level + 1]
+        starts, ends = self.starts[first:last], self.ends[first:last]
+        lengths, depths = self.lengths[first:last], self.depths[first:last]
+
+        # Pauses touching the start or the end of the audio would only cut off silence
+        kept = (starts > 0) & (ends < self.duration) & (lengths >= min_length - 1e-9)
+        order = np.argsort(starts[kept], kind='stable')
+        return (starts[kept][order] + ends[kept][order]) / 2, lengths[kept][order], depths[kept][order]
+
+    def silences(self, time, decibel="-23dB"):
+        """
+            Get the silences of at least a given duration, at the closest level of the grid.
+
+            Args:
+                time (float): Minimum duration of a silence, in seconds.
+                decibel (str | float): Level under which the audio is considered silent.
+
+            Returns:
+                list: A list of tuples containing the start and end times of the silences, sorted by start, or None if there are none.
+        """
+        level = int(np.argmin(np.abs(self.decibels - parse_decibel(decibel))))
+        first, last = self.offsets[level], self.offsets[level + 1]
+
+        # The runs of a level are sorted by length: the long enough ones are all after the first match
+        first += int(np.searchsorted(self.lengths[first:last], time - 1e-9, side='left'))
+        if first == last:
+            return None
+
+        order = np.argsort(self.starts[first:last], kind='stable')
+        return list(zip(self.starts[first:last][order].tolist(), self.ends[first:last][order].tolist()))
+
+
+def get_index_path(filepath, fingerprint, index_folder):
+    """
+        Get the path of the silence index of a source file.
+
+        Args:
+            filepath (str): The path to the source audio.
+            fingerprint (str): The content fingerprint of the source.
+            index_folder (str): The folder the indexes are kept in.
+
+        Returns:
+            str: The path of the index file.
+    """
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return os.path.join(index_folder, f'{name}_{fingerprint[:16]}.npz')
+
+
+def load_silence_index(filepath, buffer, index_folder, envelope=None):
+    """
+        Get the silence index of a source file, building and saving it to the index folder the first time.
+        The source folder is never written to, as it may be read-only or shared.
+        The index is keyed by the content fingerprint of the file, so it is rebuilt whenever the file changes.
+
+        Args:
+            filepath (str): The path to the source audio.
+            buffer (pcm_utils.PCMBuffer): The decoded samples of the file, only read if the index has to be built.
+            index_folder (str): The folder the indexes are kept in, such as the PCM cache of the output folder.
+            envelope (np.ndarray, optional): The envelope of the samples, if the caller already computed it.
+
+        Returns:
+            SilenceIndex: The index of the file.
+    """
+    fingerprint = fingerprint_utils.content_fingerprint(filepath)
+    index_path = get_index_path(filepath, fingerprint, index_folder)
+
+    # An index saved by an older version, without every array, is built again
+    if os.path.exists(index_path):
+        try:
+            return SilenceIndex.load(index_path)
+        except (KeyError, ValueError, OSError):
+            pass
+
+    index = SilenceIndex.build(buffer.samples, buffer.sample_rate, buffer.sample_width, fingerprint, envelope=envelope)
+
+    # The index is only a shortcut: if it cannot be saved, the split goes on without it
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+
+        # Removing the indexes of previous versions of the file
+        name = os.path.splitext(os.path.basename(filepath))[0]
+        for old_index_path in glob.glob(os.path.join(glob.escape(os.path.dirname(index_path)), glob.escape(name) + '_' + '?' * 16 + '.npz')):
+            os.remove(old_index_path)
+
+        index.save(index_path)
+    except OSError as error:
+        print(f'Could not save the silence index of {filepath}: {error}')
+
+    return index
+
+
+def find_cut_candidates(envelope, frame_duration, decibel="-23dB", min_length=ADAPTIVE_MIN_DURATION):
+    """
+        List every pause of an audio that could be used as a cut point, with its length and depth.
+
+        Args:
+            envelope (np.ndarray): The dBFS value of each frame.
+            frame_duration (float): The duration of one frame, in seconds.
+            decibel (str | float): Level under which a frame is considered silent.
+            min_length (float): The shortest pause kept, in seconds.
+
+        Returns:
+            tuple: The midpoint, length and mean level (in dBFS) of each pause, as three arrays sorted by midpoint.
+    """
+    run_starts, run_ends = get_quiet_runs(envelope, decibel)
+
+    # Pauses touching the start or the end of the audio would only cut off silence
+    kept = (run_starts > 0) & (run_ends < len(envelope)) & ((run_ends - run_starts) * frame_duration >= min_length - 1e-9)
+    run_starts, run_ends = run_starts[kept], run_ends[kept]
+
+    # The mean level of each run, computed for all runs at once from the cumulative sum of the envelope
+    cumulative = np.concatenate(([0.0], np.cumsum(envelope, dtype=np.float64)))
+    depths = (cumulative[run_ends] - cumulative[run_starts]) / (run_ends - run_starts)
+
+    midpoints = (run_starts + run_ends) / 2 * frame_duration
+    lengths = (run_ends - run_starts) * frame_duration
+    return midpoints, lengths, depths
+
+
+def plan_cuts(midpoints, lengths, depths, total_duration, time_threshold, decibel="-23dB", min_clip=0.6, max_clip=11):
+    """
+        Choose, among all the candidate pauses of an audio, the cuts that best pack it into clips of the [min_clip, max_clip] window.
+        Dynamic programming over the candidates maximizes the audio kept in valid clips, plus a small score per cut
+        rewarding long and deep pauses and penalizing short and shallow ones.
+
+        Args:
+            midpoints (np.ndarray): The midpoint of each candidate pause, in seconds, sorted.
+            lengths (np.ndarray): The length of each candidate pause, in seconds.
+            depths (np.ndarray): The mean level of each candidate pause, in dBFS.
+            total_duration (float): The duration of the audio, in seconds.
+            time_threshold (float): The pause length considered a natural cut point, in seconds.
+            decibel (str | float): The silence level the candidates were found with.
+            min_clip (float): The shortest usable clip, in seconds.
+            max_clip (float): The longest usable clip, in seconds.
+
+        Returns:
+            list: The times to cut at, in seconds, sorted.
+    """
+
+    # The quality of a pause mixes its length, relative to the time threshold, and its depth under the silence level.
+    # Its score stays within half of the shortest clip, so that the planner never trades usable audio for a better cut.
+    length_scores = np.minimum(lengths / max(time_threshold, 1e-9), 1.0)
+    depth_scores = np.clip((parse_decibel(decibel) - depths) / 20, 0.0, 1.0)
+    cut_scores = (0.8 * length_scores + 0.2 * depth_scores - 0.5) * min_clip
+
+    # Positions are the start of the audio, the candidates and the end of the audio
+    positions = np.concatenate(([0.0], midpoints, [total_duration]))
+    cut_scores = np.concatenate(([0.0], cut_scores, [0.0]))
+
+    best = np.full(len(positions), -np.inf)
+    best[0] = 0.0
+    previous = np.zeros(len(positions), dtype=np.int64)
+
+    for position in range(1, len(positions)):
+        # Every earlier position closer than max_clip can end the previous clip. The previous candidate always can,
+        # so that a gap longer than max_clip between two pauses still gives a (non usable) clip instead of no plan at all
+        first = min(int(np.searchsorted(positions, positions[position] - max_clip - 1e-9, side='left')), position - 1)
+        clip_lengths = positions[position] - positions[first:position]
+        # Valid clips are worth their length. Over-long clips are worth nothing, and fragments shorter than min_clip
+        # are penalized so that the planner doesn't cut slivers off valid clips
+        usable = np.where((clip_lengths >= min_clip) & (clip_lengths <= max_clip), clip_lengths,
+                          np.where(clip_lengths < min_clip, -min_clip, 0.0))
+
+        scores = best[first:position] + usable
+        chosen = int(np.argmax(scores))
+        best[position] = scores[chosen] + cut_scores[position]
+        previous[position] = first + chosen
+
+    # Walking the chosen cuts back from the end of the audio
+    cuts = []
+    position = previous[-1]
+    while position > 0:
+        cuts.append(float(positions[position]))
+        position = previous[position]
+
+    return cuts[::-1]
@@ -1,7 +1,8 @@
 import gradio as gr
-import split_utils
 import os
 
+# The utils of the tab are only imported when one of its buttons is first used, to keep the startup of the app fast
+
 
 
 def auto_fill_output(input_folder):
@@ -59,6 +60,57 @@ def use_transcription(choice):
 
 
 
+def split_audios(input_folder, time_threshold, export_folder, transcription_choice, transcription_model, silence_backend,
+                 split_mode, segmentation, workers, output_mode, conform_sample_rate, conform_mono, conform_loudness, conform_peak,
+                 progress=gr.Progress()):
+    """
+        Split the audios of the tab, reporting the progress of each file in the interface.
+
+        Returns:
+            str: The message of split_utils.split_main.
+    """
+    import conform_utils
+    import split_utils
+    conform = conform_utils.get_conform_settings(conform_sample_rate, conform_mono, conform_loudness, conform_peak)
+    return split_utils.split_main(input_folder, time_threshold, export_folder, transcription_choice, transcription_model, silence_backend,
+                                  split_mode, segmentation, workers, output_mode, progress=progress, conform=conform)
+
+
+
+def measure_quality(input_folder, workers, progress=gr.Progress()):
+    """
+        Measure the quality of the clips of the tab, reporting the progress of each batch in the interface.
+
+        Returns:
+            str: The report of quality_utils.quality_main.
+    """
+    import quality_utils
+    return quality_utils.quality_main(input_folder, workers, progress)
+
+
+def materialize_audios(input_folder, progress=gr.Progress()):
+    """
+        Write the clips of the cut indexes of a split folder, reporting the progress of each source in the interface.
+
+        Returns:
+            str: The report of split_utils.materialize_main.
+    """
+    import split_utils
+    return split_utils.materialize_main(input_folder, progress)
+
+
+def reindex_audios(input_folder):
+    """
+        Reindex the audios of the tab.
+
+        Returns:
+            str: The log of split_utils.reindex_files.
+    """
+    import split_utils
+    return split_utils.reindex_files(input_folder)
+
+
+
 def create_split_audio_interface():
     """
         Create the Gradio interface for splitting and reindexing audio files.
@@ -101,9 +153,54 @@ def create_split_audio_interface():
 
                 model_choice = gr.Dropdown(visible=False)
 
+                silence_backend = gr.Radio(label='Silence detection engine',
+                                           choices=['numpy', 'ffmpeg'],
+                                           value='numpy',
+                                           info='"numpy" analyzes the audio already loaded in memory and is much faster. "ffmpeg" is the original detection, also used to split the long segments again.')
+
+                split_mode = gr.Radio(label='Splitting mode',
+                                      choices=['memory', 'temp_files'],
+                                      value='memory',
+                                      info='"memory" decodes each audio once and cuts it without intermediate files. "temp_files" is the original engine.')
+
+                segmentation = gr.Radio(label='Segmentation',
+                                        choices=['planner', 'recursive'],
+                                        value='planner',
+                                        info='Memory mode only. "planner" chooses all the cuts at once to get as much audio as possible in 0.6 to 11 seconds clips, with the numpy engine only. "recursive" splits the long segments again.')
+
+                output_mode = gr.Radio(label='Output',
+                                       choices=['files', 'index'],
+                                       value='files',
+                                       info='Memory mode only. "files" writes every clip. "index" only writes where the clips start and end in a cuts.npz file, the clips are read from the source when needed.')
+
+
+                with gr.Accordion('Conform the clips', open=False):
+                    conform_sample_rate = gr.Dropdown(label='Sample rate',
+                                                      choices=['keep', '16000', '22050', '24000', '44100', '48000'],
+                                                      value='keep',
+                                                      info='Tortoise and ai-voice-cloning expect 22050 Hz.')
+
+                    conform_mono = gr.Checkbox(label='Downmix to mono')
+
+                    conform_loudness = gr.Number(label='Loudness (LUFS)', value=None,
+                                                 info='Normalize the loudness of every clip, for example -23. Leave empty to keep it.')
+
+                    conform_peak = gr.Number(label='Peak (dBFS)', value=None,
+                                             info='With a loudness, the highest peak allowed, for example -1. Alone, every clip is normalized to this peak.')
+
+                workers = gr.Slider(label='Parallel files', minimum=1, maximum=max(1, os.cpu_count() or 1), step=1, value=1,
+                                    info='Number of audios split at the same time, each in its own process. Every process loads its own Whisper model.')
 
                 split_btn = gr.Button("Split audios")
 
+                with gr.Group():
+                    materialize_input = gr.Textbox(
+                            label = 'Cut indexes to write as clips',
+                            info = 'Type the output folder of a split made with the "index" output')
+
+                    materialize_info = gr.Markdown(value='> Writes the clips of every cuts.npz to the Usable and NonUsable folders next to it, named as the "files" output names them.')
+                    materialize_btn = gr.Button('Write the clips')
+
                 with gr.Group():
                     reindex_input = gr.Textbox(
                             label = 'Segmented audios to reindex',
@@ -112,6 +209,15 @@ def create_split_audio_interface():
                     reindex_info = gr.Markdown(value='> Once your audios are split, you can reindex them by clicking this button.')
                     reindex_btn = gr.Button('Reindex audios')
 
+                with gr.Group():
+                    quality_input = gr.Textbox(
+                            label = 'Segmented audios to measure',
+                            info = 'Type the path of your clips, such as the split output folder or the audio folder of a dataset to review')
+
+                    quality_info = gr.Markdown(value='> Measures the clipping, SNR, loudness, DC offset and leading and trailing silence of every clip, '
+                                                     'with the number of processes of "Parallel files". The review tab then shows them for each clip of the measured folder.')
+                    quality_btn = gr.Button('Measure clip quality')
+
 
 
             with gr.Column():
@@ -119,8 +225,12 @@ def create_split_audio_interface():
 
             auto_path_btn.click(fn=auto_fill_output, inputs=input_folder, outputs=export_folder)
             transcription_choice.change(fn=use_transcription, inputs=transcription_choice, outputs = model_choice)
-            split_btn.click(fn=split_utils.split_main, inputs=[input_folder, silence_float, export_folder, transcription_choice, model_choice], outputs=out)
-            reindex_btn.click(fn=split_utils.reindex_files, inputs=reindex_input, outputs=out)
+            split_btn.click(fn=split_audios, inputs=[input_folder, silence_float, export_folder, transcription_choice, model_choice,
+                                                                   silence_backend, split_mode, segmentation, workers, output_mode,
+                                                                   conform_sample_rate, conform_mono, conform_loudness, conform_peak], outputs=out)
+            materialize_btn.click(fn=materialize_audios, inputs=materialize_input, outputs=out)
+            reindex_btn.click(fn=reindex_audios, inputs=reindex_input, outputs=out)
+            quality_btn.click(fn=measure_quality, inputs=[quality_input, workers], outputs=out)
 
                  
                 
@@ -1,11 +1,35 @@
+import glob
+import hashlib
 import re
 import subprocess
 from pydub import AudioSegment
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 import os
-import whisper
+import whisper_utils
+import export_utils
 import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import unicodedata
+import silence_utils
+import pcm_utils
+import pipeline_utils
+import manifest_utils
+import checkpoint_utils
+import fingerprint_utils
+import cut_index_utils
+import metrics_utils
+import conform_utils
+import time
+
+# Clips within these durations, in seconds, are usable by MRQ ai-voice-cloning
+USABLE_MIN_DURATION = 0.61
+USABLE_MAX_DURATION = 11
+
+# Name of the file keeping the fingerprints of the sources, in the output folder of split_main
+SPLIT_FINGERPRINTS_NAME = '.split_fingerprints.json'
+
 
 @dataclass
 class AudioProcess_Config():
@@ -20,6 +44,34 @@ class AudioProcess_Config():
     prefix : str
     transcription_choice: bool
     transcription_model : str
+    silence_backend: str = 'numpy'
+    split_mode: str = 'memory'
+    cache_folder: str = None
+    transcription_batch_size: int = whisper_utils.DEFAULT_BATCH_SIZE
+    transcription_max_wait: float = whisper_utils.DEFAULT_MAX_WAIT
+    export_workers: int = export_utils.DEFAULT_EXPORT_WORKERS
+    pipeline_queue_size: int = 32
+    use_silence_index: bool = True
+    segmentation: str = 'planner'
+    output_mode: str = 'files'
+    fingerprint: str = None
+    conform: conform_utils.ConformSettings = None
+
+
+@dataclass
+class Clip():
+    """
+        Class to carry a clip through the stages of the split pipeline
+    """
+    counter: int
+    start_frame: int
+    end_frame: int
+    export_format: str
+    segment: AudioSegment = None
+    transcription: str = ''
+    text: str = None
+    data: bytes = None
+
     
 class AudioProcessor():
     ''' 
@@ -34,23 +86,107 @@ class AudioProcessor():
                 config (AudioProcess_Config): The configuration for audio processing.
         """
         self.config = config
-        self.audio = AudioSegment.from_file(config.filepath)
+
+        # The cut index is written from the offsets of the clips, which only the memory mode has
+        if config.output_mode == 'index' and config.split_mode != 'memory':
+            raise ValueError('The cut index output needs the memory splitting mode.')
+
+        # A cut index only holds offsets in the source, there is no clip to conform
+        if config.output_mode == 'index' and config.conform is not None and config.conform.enabled:
+            raise ValueError('Conforming the clips needs the files output.')
+
+        # In memory mode, the source is decoded once to a PCM cache on disk and memory-mapped: only the pages
+        # that are sliced, analyzed or exported are read, so the memory stays flat whatever the length of the file.
+        # The original engine works on a fully decoded AudioSegment instead.
+        if config.split_mode == 'memory':
+            self.audio = None
+            self.buffer = pcm_utils.load_pcm_cache(config.filepath, config.cache_folder)
+        else:
+            self.audio = AudioSegment.from_file(config.filepath)
+            self.buffer = None
+
+        # Created on the first clip of the memory mode, to stream the clips through cut, transcription, encoding and writing.
+        # Its statistics are kept once it is closed.
+        self.pipeline = None
+        self.pipeline_stats = []
+
+        # Created on the first clip to export in temp files mode, when the clips are written in the background
+        self.writer = None
+
+        # Clips are written directly to their final folder, and the ones put aside are reported
+        self.usable_folder = os.path.join(config.output_folder, 'Usable')
+        self.non_usable_folder = os.path.join(config.output_folder, 'NonUsable')
+        if config.output_mode == 'files':
+            os.makedirs(self.usable_folder, exist_ok=True)
+            os.makedirs(self.non_usable_folder, exist_ok=True)
+        self.routing_logs = []
+
+        # The progress is checkpointed, so that a rerun with the same source and parameters skips the clips already written
+        self.checkpoint = checkpoint_utils.SplitCheckpoint.load(checkpoint_utils.get_checkpoint_path(config.output_folder), get_split_params(config))
+
+        # Every written clip is described in the manifest, so that later steps don't have to list and decode the files.
+        # When resuming, the rows of the committed clips are kept and the new ones appended.
+        manifest_path = manifest_utils.get_manifest_path(config.output_folder)
+        if self.checkpoint.committed:
+            manifest_utils.truncate_manifest(manifest_path, self.checkpoint.committed)
+        self.manifest = manifest_utils.ManifestWriter(manifest_path, 'a' if self.checkpoint.committed else 'w')
     
-    def detect_silences(self, path, time, decibel="-23dB"):
+    @property
+    def duration(self):
+        return self.buffer.duration if self.buffer is not None else len(self.audio) / 1000.0
+
+    def detect_silences(self, path, time, decibel="-23dB", segment=None):
         """
-            Detect silences in the audio file using ffmpeg.
+            Detect silences in the audio, with the engine chosen in the configuration.
 
             Args:
                 path (str): Path to the audio file.
                 time (float): Duration threshold for detecting silence.
                 decibel (str): Decibel level threshold for detecting silence.
+                segment (AudioSegment, optional): The already decoded audio at that path, used by the numpy engine.
 
             Returns:
                 list: A list of tuples containing the start and end times of detected silences.
         """
 
-        # Building the ffmpeg command for detecting silences
-        command = ["ffmpeg","-i",path,"-af",f"silencedetect=n={decibel}:d={str(time)}","-f","null","-"]
+        if self.config.silence_backend == 'ffmpeg':
+            return self.detect_silences_ffmpeg(path, time, decibel)
+
+        # The numpy engine works on decoded samples: we reuse the audio we already have whenever possible.
+        # For the whole source, the silence index answers without even reading the samples once it has been built.
+        if segment is None and self.buffer is not None and path == self.config.filepath:
+            if self.config.use_silence_index:
+                return silence_utils.load_silence_index(self.config.filepath, self.buffer, self.config.cache_folder).silences(time, decibel)
+            return self.buffer.detect_silences(0, self.buffer.frame_count, time, decibel)
+
+        if segment is None:
+            segment = self.audio if path == self.config.filepath else AudioSegment.from_file(path)
+
+        samples = silence_utils.segment_to_samples(segment)
+        return silence_utils.detect_silences_in_samples(samples, segment.frame_rate, segment.sample_width, time, decibel)
+
+    def detect_silences_ffmpeg(self, path, time, decibel="-23dB", start=None, duration=None):
+        """
+            Detect silences in the audio file using ffmpeg.
+
+            Args:
+                path (str): Path to the audio file.
+                time (float): Duration threshold for detecting silence.
+                decibel (str): Decibel level threshold for detecting silence.
+                start (float, optional): Where to start reading the file, in seconds. Defaults to its beginning.
+                duration (float, optional): How much of the file to read, in seconds. Defaults to the rest of it.
+
+            Returns:
+                list: A list of tuples containing the start and end times of detected silences, relative to start.
+        """
+
+        # Building the ffmpeg command for detecting silences. Seeking before the input makes the timestamps start at 0.
+        command = ["ffmpeg"]
+        if start is not None:
+            command += ["-ss", str(start)]
+        if duration is not None:
+            command += ["-t", str(duration)]
+        command += ["-i",path,"-af",f"silencedetect=n={decibel}:d={str(time)}","-f","null","-"]
         out = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
 
         # Storing the output of the ffmpeg output into stdout
@@ -108,20 +244,275 @@ class AudioProcessor():
             Transcribe the given audio file using the Whisper model.
 
             Args:
-                audio_path (str): Path to the audio file.
+                audio_path (str | np.ndarray): Path to the audio file, or 16 kHz mono samples.
 
             Returns:
-                str: The transcribed text, sanitized and truncated to 150 characters.
+                str: The full transcribed text. It is sanitized separately before going in a file name.
         """
 
 
-        model = whisper.load_model(self.config.transcription_model)
+        # The model is shared by every segment and every file: it is only loaded once per process
+        model = whisper_utils.get_model(self.config.transcription_model)
         transcription = model.transcribe(audio_path)
-        transcription_text = transcription['text']
-        return re.sub(r'[?!,;."]', "_", transcription_text[:150])
-    
+        return transcription['text']
+
+    def create_pipeline(self):
+        """
+            Create the pipeline the clips of the memory mode stream through: cut, transcribe, encode and write.
+            Each stage has its own workers and a bounded queue in front of it, and the detection feeds the first one.
+
+            Returns:
+                pipeline_utils.Pipeline: The started pipeline.
+        """
+        queue_size = self.config.pipeline_queue_size
+        indexing = self.config.output_mode == 'index'
+        stages = []
+
+        # With a cut index, the audio of a clip is only needed to transcribe it
+        if not indexing or self.config.transcription_choice:
+            stages.append(pipeline_utils.PipelineStage('cut', self.cut_clip, queue_size=queue_size))
+
+        # The clips are conformed on their samples before they are transcribed and encoded, NumPy releasing the GIL while it works
+        if not indexing and self.config.conform is not None and self.config.conform.enabled:
+            stages.append(pipeline_utils.PipelineStage('conform', self.conform_clip, workers=self.config.export_workers, queue_size=queue_size))
+
+        if self.config.transcription_choice:
+            batch_size = max(1, self.config.transcription_batch_size)
+            transcribe = self.transcribe_clips if batch_size > 1 else lambda clip: self.transcribe_clips([clip])[0]
+            stages.append(pipeline_utils.PipelineStage('transcribe', transcribe, queue_size=queue_size,
+                                                       batch_size=batch_size, max_wait=self.config.transcription_max_wait))
+
+        if indexing:
+            stages.append(pipeline_utils.PipelineStage('index', self.index_clip, queue_size=queue_size))
+        else:
+            stages.append(pipeline_utils.PipelineStage('encode', self.encode_clip, workers=self.config.export_workers, queue_size=queue_size))
+            stages.append(pipeline_utils.PipelineStage('write', self.write_clip, queue_size=queue_size))
+
+        return pipeline_utils.Pipeline(stages, source_name='detect')
+
+    def cut_clip(self, clip):
+        """
+            Pipeline stage: build the audio of a clip out of the samples of the buffer.
+
+            Args:
+                clip (Clip): The clip to cut.
+
+            Returns:
+                Clip: The clip with its segment.
+        """
+        clip.segment = self.buffer.to_segment(clip.start_frame, clip.end_frame)
+        return clip
+
+    def conform_clip(self, clip):
+        """
+            Pipeline stage: resample, downmix and normalize a clip as requested by the configuration.
+
+            Args:
+                clip (Clip): The clip to conform.
+
+            Returns:
+                Clip: The clip with its conformed segment.
+        """
+        clip.segment = conform_utils.conform_segment(clip.segment, self.config.conform)
+        return clip
+
+    def transcribe_clips(self, clips):
+        """
+            Pipeline stage: transcribe a batch of clips, with a single Whisper pass when batching is enabled.
+
+            Args:
+                clips (list): The clips to transcribe.
+
+            Returns:
+                list: The clips with their full and sanitized transcription.
+        """
+        audios = [pcm_utils.to_whisper_input(clip.segment) for clip in clips]
+
+        if self.config.transcription_batch_size <= 1:
+            texts = [self.transcribe_audio(audio) for audio in audios]
+        else:
+            model = whisper_utils.get_model(self.config.transcription_model)
+            texts = whisper_utils.transcribe_batch(model, audios)
+
+        for clip, text in zip(clips, texts):
+            clip.text = text
+            clip.transcription = sanitize_transcription(text)
+
+        return clips
+
+    def encode_clip(self, clip):
+        """
+            Pipeline stage: encode a clip to its export format, in memory.
+
+            Args:
+                clip (Clip): The clip to encode.
+
+            Returns:
+                Clip: The clip with its encoded data. The decoded segment is released.
+        """
+        clip.data = export_utils.encode_segment(clip.segment, clip.export_format)
+        clip.segment = None
+        return clip
+
+    def write_clip(self, clip):
+        """
+            Pipeline stage: write an encoded clip to the output folder.
+
+            Args:
+                clip (Clip): The clip to write.
+
+            Returns:
+                Clip: The written clip.
+        """
+        suffix = f"_{clip.transcription}" if clip.transcription else ""
+        duration = round((clip.end_frame - clip.start_frame) / self.buffer.sample_rate, 3)
+        segment_path = self.get_segment_path(suffix, clip.export_format, clip.counter, duration)
+
+        with open(segment_path, 'wb') as segment_file:
+            segment_file.write(clip.data)
+
+        print(f"Saved {segment_path}")
+        self.record_clip(segment_path, clip.counter, clip.start_frame, clip.end_frame, self.buffer.sample_rate, clip.text, clip.data)
+        return clip
+
+    def index_clip(self, clip):
+        """
+            Pipeline stage: record a clip in the manifest without writing any audio. The cut index is built from the manifest at the end.
+
+            Args:
+                clip (Clip): The clip to record.
+
+            Returns:
+                Clip: The recorded clip. Its segment is released.
+        """
+        clip.segment = None
+        self.record_clip(None, clip.counter, clip.start_frame, clip.end_frame, self.buffer.sample_rate, clip.text, None)
+        return clip
+
+    def record_clip(self, segment_path, counter, start_sample, end_sample, sample_rate, transcript, data):
+        """
+            Describe a written clip in the manifest.
+
+            Args:
+                segment_path (str): The path the clip was written to, None if it is only in the cut index.
+                counter (int): The number of the clip.
+                start_sample (int): The first sample offset of the clip in the source.
+                end_sample (int): The sample offset after the last sample of the clip in the source.
+                sample_rate (int): The sample rate of the source.
+                transcript (str): The full transcription of the clip, None if it was not transcribed.
+                data (bytes): The encoded clip, hashed to detect later changes to the file. None if it is only in the cut index.
+        """
+        duration = round((end_sample - start_sample) / sample_rate, 3)
+        path = os.path.relpath(segment_path, self.config.output_folder) if segment_path else None
+        self.manifest.write({
+            'source': self.config.filepath,
+            'counter': counter,
+            'start_sample': int(start_sample),
+            'end_sample': int(end_sample),
+            'sample_rate': int(sample_rate),
+            'duration': duration,
+            'path': path,
+            'routing': self.route(duration),
+            'transcript': transcript,
+            'sha1': hashlib.sha1(data).hexdigest() if data is not None else None,
+        })
+
+        # The clip only counts as done once it is in the manifest
+        self.checkpoint.add(counter, int(end_sample), path)
+
+    def finish(self, complete=True):
+        """
+            Wait for the clips still in the pipeline or in the background writer to be written, then close the manifest
+            and save the checkpoint.
+
+            Args:
+                complete (bool, optional): Whether every clip of the source was submitted. Defaults to True.
+
+            Returns:
+                list: The statistics of each pipeline stage, as text lines.
+
+            Raises:
+                RuntimeError: If some clips could not be processed.
+        """
+        failures = []
+        report = []
+
+        if self.pipeline is not None:
+            failures += self.pipeline.close()
+            report = self.pipeline.report()
+            self.pipeline_stats = self.pipeline.stats()
+            self.pipeline = None
+
+        if self.writer is not None:
+            failures += self.writer.close()
+            self.writer = None
+
+        # Every clip has been recorded once the pipeline and the writer are done
+        self.manifest.close()
+        if self.config.output_mode == 'index':
+            self.save_cut_index()
+        self.checkpoint.save(complete=complete and not failures)
+
+        if failures:
+            failed_clips = "\n".join(f'{name}: {str(error) or type(error).__name__}' for name, error in failures)
+            raise RuntimeError(f'{len(failures)} clips could not be processed:\n{failed_clips}')
+
+        return report
+
+    def save_cut_index(self):
+        """
+            Write the cut index of the source from its manifest, which also holds the clips recorded by an interrupted run.
+        """
+        rows = sorted(manifest_utils.read_manifest(self.manifest.manifest_path), key=lambda row: row['counter'])
+
+        cut_index_utils.save_cut_index(
+            os.path.join(self.config.output_folder, cut_index_utils.CUT_INDEX_NAME),
+            source=self.config.filepath,
+            cache_folder=self.config.cache_folder,
+            fingerprint=self.checkpoint.params['fingerprint'],
+            sample_rate=self.buffer.sample_rate,
+            counters=[row['counter'] for row in rows],
+            starts=[row['start_sample'] for row in rows],
+            ends=[row['end_sample'] for row in rows],
+            usable=[row['routing'] == 'Usable' for row in rows],
+        )
+
+    def get_segment_path(self, suffix, export_format, counter, duration):
+        """
+            Build the path a segment is exported to. Segments go straight to the Usable or NonUsable folder
+            depending on their duration, which is known from their number of samples.
+
+            Args:
+                suffix (str): The suffix for the file name.
+                export_format (str): The format to export the audio segment.
+                counter (int): The counter for numbering the files.
+                duration (float): The duration of the segment, in seconds.
+
+            Returns:
+                str: The path of the file in the Usable or NonUsable folder.
+        """
+
+        file_name = get_clip_name(self.config.prefix, counter, suffix, export_format)
+
+        if self.route(duration) == 'Usable':
+            return os.path.join(self.usable_folder, file_name)
+
+        self.routing_logs.append(f'{file_name} was put aside because it is {duration} seconds. Moved to not selected.')
+        return os.path.join(self.non_usable_folder, file_name)
+
+    def route(self, duration):
+        """
+            Decide where a clip goes from its duration.
+
+            Args:
+                duration (float): The duration of the clip, in seconds.
+
+            Returns:
+                str: 'Usable' if MRQ ai-voice-cloning can use the clip, 'NonUsable' otherwise.
+        """
+        return 'Usable' if USABLE_MIN_DURATION <= duration <= USABLE_MAX_DURATION else 'NonUsable'
 
-    def export_audio_segment(self, segment, suffix, export_format, counter):
+    def export_audio_segment(self, segment, suffix, export_format, counter, start_sample=0, transcript=None):
         """
             Export the given audio segment to the specified format.
 
@@ -130,29 +521,33 @@ class AudioProcessor():
                 suffix (str): The suffix for the file name.
                 export_format (str): The format to export the audio segment.
                 counter (int): The counter for numbering the files.
+                start_sample (int, optional): The first sample offset of the segment in the source, for the manifest.
+                transcript (str, optional): The full transcription of the segment, for the manifest.
 
             Returns:
                 int: The incremented counter.
         """
 
-        # Change the number of digits here if you need another nomenclature 
-        padded_index = str(counter).zfill(6)
+        segment_path = self.get_segment_path(suffix, export_format, counter, len(segment) / 1000.0)
+        end_sample = start_sample + int(segment.frame_count())
+        sample_rate = segment.frame_rate
+        record = lambda data: self.record_clip(segment_path, counter, start_sample, end_sample, sample_rate, transcript, data)
 
-        # Sanitize prefix and suffix: replace spaces with '_', remove special characters, and avoid consecutive underscores
-        sanitize = lambda s: re.sub(r'_{2,}', '_', re.sub(r'[^a-zA-Z0-9_]', '_', s.replace(' ', '_')))
-        sanitized_prefix = sanitize(self.config.prefix)
-        sanitized_suffix = sanitize(suffix) if suffix else ''
-        file_name = f"{sanitized_prefix}_{padded_index}_{sanitized_suffix}".strip('_')
+        # The offsets recorded in the manifest are the ones of the source, the conformed clip may have another sample rate
+        if self.config.conform is not None and self.config.conform.enabled:
+            segment = conform_utils.conform_segment(segment, self.config.conform)
 
-        # Further ensure no consecutive underscores and no leading/trailing underscore
-        file_name = re.sub(r'_+', '_', file_name).rstrip('_')  # Remove trailing underscore if present
+        if self.config.export_workers <= 1:
+            export_utils.write_segment(segment, segment_path, export_format, record)
+            return counter + 1
 
-        segment_path = os.path.join(self.config.output_folder, f'{file_name}.{export_format}')
-        segment.export(segment_path, format=export_format)
-        print(f"Saved {segment_path}")
+        # The encoding is handed to the background writer, the splitter goes on with the next cut
+        if self.writer is None:
+            self.writer = export_utils.ExportWriter(self.config.export_workers)
+        self.writer.submit(segment, segment_path, export_format, record)
         return counter + 1
     
-    def process_segment(self, audio, start_point, end_point, counter, export_format):
+    def process_segment(self, audio, start_point, end_point, counter, export_format, offset=0.0):
         """
             Process a segment of audio, splitting further if needed and transcribing.
 
@@ -162,6 +557,7 @@ class AudioProcessor():
                 end_point (float): The end time of the segment.
                 counter (int): The counter for numbering the files.
                 export_format (str): The format to export the audio segment.
+                offset (float, optional): The start time of the audio in the source, in seconds. Defaults to 0.
 
             Returns:
                 int: The updated counter after processing the segment.
@@ -173,8 +569,34 @@ class AudioProcessor():
         # Extracting the audio segment according to the start and end point. If no endpoint, it extracts from the start point to the end of the audio.
         segment = audio[start_point * 1000:end_point * 1000] if end_point else audio[start_point * 1000:]
 
-        # We store the segment in a temporary path, in case we need to split it further.
-        temp_segment_path = f"temp_segment.{export_format}"
+        # We store the segment in a temporary file of its own, in case we need to split it further.
+        # Each call gets a unique name in the output folder, so that the workers splitting other sources don't overwrite it.
+        handle, temp_segment_path = tempfile.mkstemp(prefix='.temp_segment_', suffix=f'.{export_format}', dir=self.config.output_folder)
+        os.close(handle)
+        try:
+            counter = self.process_temp_segment(segment, temp_segment_path, counter, export_format, start_point, offset)
+        finally:
+            os.remove(temp_segment_path)
+
+        return counter
+    
+
+
+    def process_temp_segment(self, segment, temp_segment_path, counter, export_format, start_point, offset=0.0):
+        """
+            Split further or transcribe and export a segment of the temp files mode, written to its temporary file.
+
+            Args:
+                segment (AudioSegment): The audio of the segment.
+                temp_segment_path (str): The temporary file to write the segment to.
+                counter (int): The counter for numbering the files.
+                export_format (str): The format to export the audio segment.
+                start_point (float): The start time of the segment in the audio.
+                offset (float, optional): The start time of the audio in the source, in seconds. Defaults to 0.
+
+            Returns:
+                int: The updated counter after processing the segment.
+        """
         segment.export(temp_segment_path, format=export_format)
 
         #segment_processed = False # Flag to track if the segment has been processed (split or transcribed)
@@ -184,20 +606,20 @@ class AudioProcessor():
             # a new time threshold is defined to try and detect smaller silences
             new_time_threshold = self.config.time_threshold * 0.625
             print(f'new time threshold is {new_time_threshold}')
-            new_silence_periods = self.detect_silences(temp_segment_path, new_time_threshold)
+            new_silence_periods = self.detect_silences(temp_segment_path, new_time_threshold, segment=segment)
 
             # If no silence found, reduce the time threshold again and try again
             if new_silence_periods is None:  
                     new_time_threshold = new_time_threshold * 0.625
                     print(f'new time threshold is {new_time_threshold}')
-                    new_silence_periods = self.detect_silences(temp_segment_path, new_time_threshold)
+                    new_silence_periods = self.detect_silences(temp_segment_path, new_time_threshold, segment=segment)
                     
 
             # If new silences are detected, the midpoints are calculated and the whole thing is sent back to split and transcribe audio for configuration.
             # It will then be sent back here through "process_segment"
             if new_silence_periods is not None:
                 new_midpoints = [(start + end) / 2 for start, end in new_silence_periods]
-                counter = self.split_and_transcribe_audio(new_midpoints, counter, audio_path=temp_segment_path)
+                counter = self.split_and_transcribe_audio(new_midpoints, counter, audio_path=temp_segment_path, offset=offset + start_point)
                 #segment_processed = True
             else:
                 print(f"Unable to split the segment further. Segment duration: {len(segment)/1000.0} seconds. It will be processed as is.")
@@ -207,18 +629,182 @@ class AudioProcessor():
         # or if it couldn't be split further
         #if not segment_processed:
         else:
+            # Clips written by an interrupted run keep their number, they are not transcribed nor exported again
+            if self.checkpoint.is_committed(counter):
+                return counter + 1
+
             suffix = ""
+            transcription = None
             if self.config.transcription_choice:
                 transcription = self.transcribe_audio(temp_segment_path)
-                suffix = f"_{transcription}"
-            counter = self.export_audio_segment(segment, suffix, export_format, counter)
+                suffix = f"_{sanitize_transcription(transcription)}"
+            start_sample = round((offset + start_point) * segment.frame_rate)
+            counter = self.export_audio_segment(segment, suffix, export_format, counter, start_sample, transcription)
 
 
         return counter
-    
 
+    def process_buffer_segment(self, start_frame, end_frame, counter, export_format):
+        """
+            Process a segment of the decoded source given by sample offsets, splitting further if needed and transcribing.
+            Unlike process_segment, no temporary file is written: the recursion only works on views of the buffer.
+
+            Args:
+                start_frame (int): The first sample offset of the segment.
+                end_frame (int): The sample offset after the last sample of the segment.
+                counter (int): The counter for numbering the files.
+                export_format (str): The format to export the audio segment.
+
+            Returns:
+                int: The updated counter after processing the segment.
+        """
+
+        duration = (end_frame - start_frame) / self.buffer.sample_rate
 
-    def split_and_transcribe_audio(self, midpoints, counter=1, audio_path=None):
+        # Split further based on segment duration : the threshold is 11 seconds based on MRQ ai-voice-cloning's specs.
+        if duration > 11:
+            # Instead of lowering the time threshold step by step, many silence durations and levels are evaluated
+            # on the envelope of the segment, and the least aggressive ones giving clips between 0.6 and 11 seconds are kept.
+            # The ffmpeg engine lowers the threshold as the temp files mode does, on the same region of the source.
+            if self.config.silence_backend == 'ffmpeg':
+                search_result = self.search_silences_ffmpeg(start_frame, end_frame)
+            else:
+                search_result = self.buffer.search_silences(start_frame, end_frame, self.config.time_threshold)
+
+            # The midpoints are relative to the segment, the recursion continues on the same buffer
+            if search_result is not None:
+                new_silence_periods, new_time_threshold, new_decibel = search_result
+                print(f'new thresholds are {new_time_threshold:.3f} seconds at {new_decibel}dB')
+                new_midpoints = [(start + end) / 2 for start, end in new_silence_periods]
+                return self.split_buffer(new_midpoints, counter, start_frame, end_frame)
+
+            print(f"Unable to split the segment further. Segment duration: {duration} seconds. It will be processed as is.")
+
+        return self.submit_clip(start_frame, end_frame, counter, export_format)
+
+    def search_silences_ffmpeg(self, start_frame, end_frame, decibel="-23dB"):
+        """
+            Look for silences in a region of the source with ffmpeg, lowering the time threshold twice like process_segment does.
+
+            Args:
+                start_frame (int): The first sample offset of the region.
+                end_frame (int): The sample offset after the last sample of the region.
+                decibel (str): Decibel level threshold for detecting silence.
+
+            Returns:
+                tuple: The silences relative to the region, the time threshold and the level that found them, or None if none was found.
+        """
+        start = start_frame / self.buffer.sample_rate
+        duration = (end_frame - start_frame) / self.buffer.sample_rate
+
+        new_time_threshold = self.config.time_threshold
+        for _ in range(2):
+            new_time_threshold = new_time_threshold * 0.625
+            new_silence_periods = self.detect_silences_ffmpeg(self.config.filepath, new_time_threshold, decibel, start, duration)
+            if new_silence_periods:
+                return new_silence_periods, new_time_threshold, silence_utils.parse_decibel(decibel)
+
+        return None
+
+    def submit_clip(self, start_frame, end_frame, counter, export_format):
+        """
+            Hand a clip to the pipeline, which cuts, transcribes, encodes and writes it while the detection goes on.
+            The counter is reserved now, so that the file names follow the order of the cuts.
+
+            Args:
+                start_frame (int): The first sample offset of the clip.
+                end_frame (int): The sample offset after the last sample of the clip.
+                counter (int): The counter for numbering the file.
+                export_format (str): The format to export the clip.
+
+            Returns:
+                int: The incremented counter.
+        """
+        # Clips written by an interrupted run keep their number, they are not cut again
+        if self.checkpoint.is_committed(counter):
+            return counter + 1
+
+        if self.pipeline is None:
+            self.pipeline = self.create_pipeline()
+        self.pipeline.submit(Clip(counter, start_frame, end_frame, export_format))
+        return counter + 1
+
+    def plan_cuts(self, decibel="-23dB"):
+        """
+            Plan the cuts of the whole source at once: every pause is a candidate, and the planner picks the ones
+            that best pack the audio into clips between 0.6 and 11 seconds.
+
+            Args:
+                decibel (str): Level under which the audio is considered silent.
+
+            Returns:
+                list: The times to cut at, in seconds, or None if the source has no pause at all.
+        """
+        # With the silence index, the candidates are read from it instead of computing the envelope of the source again
+        if self.config.use_silence_index:
+            index = silence_utils.load_silence_index(self.config.filepath, self.buffer, self.config.cache_folder)
+            midpoints, lengths, depths = index.cut_candidates(decibel)
+        else:
+            envelope = silence_utils.compute_energy_envelope(self.buffer.samples, self.buffer.sample_rate, self.buffer.sample_width)
+            frame_duration = max(1, int(self.buffer.sample_rate * silence_utils.DEFAULT_FRAME_MS / 1000)) / self.buffer.sample_rate
+            midpoints, lengths, depths = silence_utils.find_cut_candidates(envelope, frame_duration, decibel)
+
+        if len(midpoints) == 0:
+            return None
+
+        return silence_utils.plan_cuts(midpoints, lengths, depths, self.buffer.duration, self.config.time_threshold, decibel)
+
+    def split_planned(self, cuts, counter=1):
+        """
+            Split the decoded source at planned cuts, in a single pass and without recursion.
+
+            Args:
+                cuts (list): The times to cut at, in seconds, sorted.
+                counter (int, optional): The counter for numbering the files. Defaults to 1.
+
+            Returns:
+                int: The updated counter after processing all clips.
+        """
+        export_format = get_export_format(self.config.filepath)
+        os.makedirs(self.config.output_folder, exist_ok=True)
+
+        cut_points = [0] + [self.buffer.to_frame(cut) for cut in cuts] + [self.buffer.frame_count]
+        for clip_start, clip_end in zip(cut_points, cut_points[1:]):
+            if clip_end > clip_start:
+                counter = self.submit_clip(clip_start, clip_end, counter, export_format)
+
+        return counter
+
+    def split_buffer(self, midpoints, counter=1, start_frame=0, end_frame=None):
+        """
+            Split the decoded source at the given midpoints, without any intermediate file.
+
+            Args:
+                midpoints (list): The list of midpoints to split the audio, in seconds relative to start_frame.
+                counter (int, optional): The counter for numbering the files. Defaults to 1.
+                start_frame (int, optional): The first sample offset of the region to split. Defaults to 0.
+                end_frame (int, optional): The sample offset after the region to split. Defaults to the end of the source.
+
+            Returns:
+                int: The updated counter after processing all segments.
+        """
+
+        end_frame = self.buffer.frame_count if end_frame is None else end_frame
+        export_format = get_export_format(self.config.filepath)
+        os.makedirs(self.config.output_folder, exist_ok=True)
+
+        # Converting the midpoints into absolute sample offsets, and bounding the region with its own start and end
+        cut_points = [start_frame]
+        cut_points += [min(start_frame + self.buffer.to_frame(midpoint), end_frame) for midpoint in midpoints]
+        cut_points.append(end_frame)
+
+        for segment_start, segment_end in zip(cut_points, cut_points[1:]):
+            if segment_end > segment_start:
+                counter = self.process_buffer_segment(segment_start, segment_end, counter, export_format)
+
+        return counter
+
+    def split_and_transcribe_audio(self, midpoints, counter=1, audio_path=None, offset=0.0):
         """
             Split the audio at the given midpoints and transcribe the segments.
 
@@ -226,26 +812,26 @@ class AudioProcessor():
                 midpoints (list): The list of midpoints to split the audio.
                 counter (int, optional): The counter for numbering the files. Defaults to 1.
                 audio_path (str, optional): The path to the audio file. Defaults to None.
+                offset (float, optional): The start time of the audio in the source, in seconds. Defaults to 0.
 
             Returns:
                 int: The updated counter after processing all segments.
         """
  
         audio_path = audio_path or self.config.filepath
-        audio = AudioSegment.from_file(audio_path)
-        input_format = audio_path.split('.')[-1].lower()
-        export_format = input_format if input_format in ['wav', 'mp3', 'm4b'] else 'wav'
+        audio = self.audio if audio_path == self.config.filepath else AudioSegment.from_file(audio_path)
+        export_format = get_export_format(audio_path)
         os.makedirs(self.config.output_folder, exist_ok=True)
 
         
         start_point = 0
 
         for end_point in midpoints:
-            counter = self.process_segment(audio, start_point, end_point, counter, export_format)
+            counter = self.process_segment(audio, start_point, end_point, counter, export_format, offset)
             start_point = end_point
      
         # Process the last remaining segment
-        counter = self.process_segment(audio, start_point, None, counter, export_format)
+        counter = self.process_segment(audio, start_point, None, counter, export_format, offset)
 
         return counter
     
@@ -255,7 +841,86 @@ class AudioProcessor():
 
 
 
-def instantiate_config(filepath, time_threshold, output_folder, transcription_choice, transcription_model):
+def get_clip_name(prefix, counter, suffix, export_format):
+    """
+        Build the file name of a clip from the name of its source and its number.
+
+        Args:
+            prefix (str): The name of the source, without its extension.
+            counter (int): The number of the clip.
+            suffix (str): The suffix for the file name, such as the start of its transcription.
+            export_format (str): The format the clip is exported to.
+
+        Returns:
+            str: The file name of the clip.
+    """
+
+    # Change the number of digits here if you need another nomenclature 
+    padded_index = str(counter).zfill(6)
+
+    # Sanitize prefix and suffix: replace spaces with '_', remove special characters, and avoid consecutive underscores
+    sanitize = lambda s: re.sub(r'_{2,}', '_', re.sub(r'[^a-zA-Z0-9_]', '_', s.replace(' ', '_')))
+    sanitized_prefix = sanitize(prefix)
+    sanitized_suffix = sanitize(suffix) if suffix else ''
+    file_name = f"{sanitized_prefix}_{padded_index}_{sanitized_suffix}".strip('_')
+
+    # Further ensure no consecutive underscores and no leading/trailing underscore
+    file_name = re.sub(r'_+', '_', file_name).rstrip('_')  # Remove trailing underscore if present
+    return f'{file_name}.{export_format}'
+
+
+def sanitize_transcription(text):
+    """
+        Make a transcription usable in a file name.
+
+        Args:
+            text (str): The transcribed text.
+
+        Returns:
+            str: The text with punctuation replaced, truncated to 150 characters.
+    """
+    return re.sub(r'[?!,;."]', "_", text[:150])
+
+
+def get_export_format(audio_path):
+    """
+        Get the format the segments of an audio should be exported to.
+
+        Args:
+            audio_path (str): The path to the audio file.
+
+        Returns:
+            str: The input format if it can be exported as is, 'wav' otherwise.
+    """
+    input_format = audio_path.split('.')[-1].lower()
+    return input_format if input_format in ['wav', 'mp3', 'm4b'] else 'wav'
+
+
+def get_split_params(config):
+    """
+        Gather what the clips of a split depend on: the content of the source and the parameters changing the cuts or the file names.
+
+        Args:
+            config (AudioProcess_Config): The configuration for audio processing.
+
+        Returns:
+            dict: The fingerprint of the source and the split parameters.
+    """
+    return {
+        'fingerprint': config.fingerprint or fingerprint_utils.content_fingerprint(config.filepath),
+        'time_threshold': config.time_threshold,
+        'silence_backend': config.silence_backend,
+        'split_mode': config.split_mode,
+        'segmentation': config.segmentation,
+        'output_mode': config.output_mode,
+        'transcription_model': config.transcription_model if config.transcription_choice else None,
+        'conform': asdict(config.conform) if config.conform is not None and config.conform.enabled else None,
+    }
+
+
+def instantiate_config(filepath, time_threshold, output_folder, transcription_choice, transcription_model, silence_backend='numpy', split_mode='memory', segmentation='planner',
+                       transcription_batch_size=whisper_utils.DEFAULT_BATCH_SIZE, transcription_max_wait=whisper_utils.DEFAULT_MAX_WAIT, output_mode='files',
+                       conform=None):
     """
         Instantiate the configuration for audio processing.
 
@@ -265,12 +930,20 @@ def instantiate_config(filepath, time_threshold, output_folder, transcription_ch
             output_folder (str): The folder to save the output files.
             transcription_choice (bool): Whether to transcribe the audio or not.
             transcription_model (str): The transcription model to use.
+            silence_backend (str): The silence detection engine, 'numpy' or 'ffmpeg'.
+            split_mode (str): 'memory' to split sample-offset views of the decoded source, 'temp_files' for the original engine.
+            segmentation (str): In memory mode, 'planner' to plan all the cuts in one pass, 'recursive' to split over-long segments again.
+            transcription_batch_size (int): The number of clips transcribed together in memory mode, 1 to disable batching.
+            transcription_max_wait (float): The longest time a clip waits for its transcription batch to fill up, in seconds.
+            output_mode (str): 'files' to write every clip, 'index' to only write a cut index of the clips, in memory mode.
+            conform (conform_utils.ConformSettings, optional): The sample rate, channels and loudness the clips are conformed to before being written.
 
         Returns:
             AudioProcess_Config: The configuration for audio processing.
     """
     input_format = filepath.split('.')[-1].lower()
     prefix = os.path.basename(filepath).rsplit('.', 1)[0]
+    cache_folder = os.path.join(output_folder, '.pcm_cache')
     output_folder = os.path.join(output_folder, prefix)
     
    
@@ -282,8 +955,15 @@ def instantiate_config(filepath, time_threshold, output_folder, transcription_ch
         time_threshold=time_threshold,
         prefix=prefix,
         transcription_choice=transcription_choice,
-        transcription_model=transcription_model
-        
+        transcription_model=transcription_model,
+        silence_backend=silence_backend,
+        split_mode=split_mode,
+        segmentation=segmentation,
+        cache_folder=cache_folder,
+        transcription_batch_size=transcription_batch_size,
+        transcription_max_wait=transcription_max_wait,
+        output_mode=output_mode,
+        conform=conform
     )
 
 def reindex_files(input_folder):
@@ -334,59 +1014,6 @@ def reindex_files(input_folder):
 
 
     
-def get_audio_duration(file_path):
-    """
-        Get the duration of the audio file.
-
-        Args:
-            file_path (str): The path to the audio file.
-
-        Returns:
-            float: The duration of the audio file in seconds.
-    """
-
-    audio = AudioSegment.from_file(file_path, format="mp3")
-    return len(audio) / 1000.0  # Duration in seconds
-
-
-def move_usable_files(source, usable_folder, not_selected_folder):
-    """
-        Move audio files to 'usable' or 'not selected' folders based on their duration.
-
-        Args:
-            source (str): The source directory containing audio files.
-            usable_folder (str): The directory to move usable files.
-            not_selected_folder (str): The directory to move non-usable files.
-
-        Returns:
-            list: A log of moved files.
-    """
-    output_logs =  []
-
-    if not os.path.exists(usable_folder):
-        os.makedirs(usable_folder)
-
-    if not os.path.exists(not_selected_folder):
-        os.makedirs(not_selected_folder)
-
-
-    for filename in os.listdir(source):
-        if filename.endswith('.wav') or filename.endswith('.mp3'):  # Add other formats if needed
-            file_path = os.path.join(source, filename)
-            duration = get_audio_duration(file_path)
-
-            if 0.61 <= duration <= 11:
-                shutil.move(file_path, os.path.join(usable_folder, filename))
-                
-            else:
-                shutil.move(file_path, os.path.join(not_selected_folder, filename))
-                output_logs.append(f'{filename} was put aside because it is {duration} seconds. Moved to not selected.')
-
-            print(f"Moved: {filename}, Duration: {duration} seconds")
-
-    return output_logs
-
-
 def get_files(folder):
     """
         Get a list of audio files in the specified folder.
@@ -423,7 +1050,170 @@ def get_files(folder):
 
 
     
-def split_main(filepath, time_threshold, output_folder, transcription_choice, transcription_model):
+def split_file(process_config):
+    """
+        Split, and transcribe if requested, a single audio file into its own output folder.
+        This is what each worker runs when several files are split in parallel.
+
+        Args:
+            process_config (AudioProcess_Config): The configuration for this file.
+
+        Returns:
+            tuple: A log of the operations worth reporting for this file, and the summary of its metrics.
+    """
+
+    # Each file has its own output folder, so the numbering restarts for each of them
+    counter = 1
+    os.makedirs(process_config.output_folder, exist_ok=True)
+    metrics = metrics_utils.RunMetrics(os.path.basename(process_config.filepath))
+
+    started = time.monotonic()
+    ap = AudioProcessor(process_config)
+    metrics.add('decode', time.monotonic() - started, ap.duration, 1)
+
+    planned = process_config.split_mode == 'memory' and process_config.segmentation == 'planner'
+    resumed = ap.checkpoint.committed
+    complete = False
+    logs = []
+
+    try:
+        # The planner chooses its cuts among all the pauses of the file, the recursive engines start from the silences of the threshold
+        with metrics.stage('detect', ap.duration):
+            if planned:
+                midpoints = ap.plan_cuts()
+            elif silence_list := ap.detect_silences(process_config.filepath, process_config.time_threshold):
+                midpoints = [(start + end) / 2 for start, end in silence_list]
+            else:
+                midpoints = None
+
+        # The numbering always starts at 1: the clips committed by an interrupted run are skipped, not numbered again.
+        # In memory mode this only feeds the pipeline, in temp files mode the clips are processed right away.
+        if midpoints is None:
+            logs.append(f'No silences of {process_config.time_threshold} seconds where detected. Try a shorter time period.')
+        else:
+            with metrics.stage('split', ap.duration):
+                if planned:
+                    ap.split_planned(midpoints, counter)
+                elif process_config.split_mode == 'memory':
+                    ap.split_buffer(midpoints, counter)
+                else:
+                    ap.split_and_transcribe_audio(midpoints, counter)
+        complete = True
+
+    # Every clip has to be written and recorded in the manifest, and the background workers stopped, even if the split failed.
+    # The checkpoint is only marked complete if the whole source went through.
+    finally:
+        with metrics.stage('drain', items=0):
+            report = ap.finish(complete)
+
+    # The source of the pipeline is the split stage above, only its own stages are added
+    for stage in ap.pipeline_stats[1:]:
+        metrics.add(stage['stage'], stage['busy_seconds'], ap.duration if stage['processed'] else 0.0, stage['processed'], stage['wait_seconds'])
+
+    metrics.record(file=os.path.basename(process_config.filepath), audio_seconds=ap.duration, clips=ap.checkpoint.committed, resumed=resumed)
+    metrics.finish()
+
+    if resumed:
+        report = [f'Resumed after the {resumed} clips written by a previous run.'] + report
+
+    return logs + report + ap.routing_logs, metrics.summary()
+
+
+def split_files(filepath, time_threshold, output_folder, transcription_choice, transcription_model, silence_backend='numpy', split_mode='memory',
+                segmentation='planner', workers=1, output_mode='files', transcription_batch_size=whisper_utils.DEFAULT_BATCH_SIZE,
+                transcription_max_wait=whisper_utils.DEFAULT_MAX_WAIT, progress=None, conform=None):
+    """
+        Split, and transcribe if requested, every audio file of a folder. The arguments are the same as split_main's.
+
+        Returns:
+            dict: The input files, the names of the ones that failed, the merged logs, and the metrics summary and path of the run.
+
+        Raises:
+            ValueError: If the folder holds unsupported audio files, or the planner segmentation is used with the ffmpeg engine.
+    """
+
+    # The planner chooses among the pauses of the NumPy envelope, ffmpeg only gives the silences of one threshold
+    if split_mode == 'memory' and segmentation == 'planner' and silence_backend == 'ffmpeg':
+        raise ValueError('The planner segmentation only works with the numpy silence detection engine. Choose the recursive segmentation to detect silences with ffmpeg.')
+
+    files = get_files(filepath)
+
+    # get_files returns an error message instead of a list when the folder holds unsupported files
+    if isinstance(files, str):
+        raise ValueError(files)
+
+    configs = [instantiate_config(file, time_threshold, output_folder, transcription_choice, transcription_model,
+                                  silence_backend, split_mode, segmentation, transcription_batch_size, transcription_max_wait, output_mode, conform)
+               for file in files]
+
+    # The logs and errors of each file are collected independently, so that one file failing doesn't stop the others
+    results = {}
+    workers = max(1, int(workers or 1))
+    metrics = metrics_utils.RunMetrics('split', progress, total=len(files))
+
+    def collect(file, logs, summary=None, error=None):
+        # Each file is reported as soon as it is done, in whatever order the workers finish
+        results[file] = (logs, error)
+        if summary is not None:
+            metrics.merge(summary)
+            for item in summary['items']:
+                metrics.record(**item, wall_seconds=summary['wall_seconds'])
+        metrics.advance(f'{os.path.basename(file)} ' + ('failed' if error is not None else 'done'))
+
+    # Sources whose content and split parameters match a completed run are not split again.
+    # Only the sources whose size or modification time changed are read to be fingerprinted.
+    fingerprints = fingerprint_utils.FingerprintCache(os.path.join(output_folder, SPLIT_FINGERPRINTS_NAME))
+    for config in configs:
+        config.fingerprint = fingerprints.fingerprint(config.filepath)
+    fingerprints.save()
+
+    for config in list(configs):
+        checkpoint_path = checkpoint_utils.get_checkpoint_path(config.output_folder)
+        if checkpoint_utils.SplitCheckpoint.load(checkpoint_path, get_split_params(config)).complete:
+            collect(config.filepath, ['Unchanged since its last split, skipped.'])
+            configs.remove(config)
+
+    if workers > 1 and len(configs) > 1:
+        # Spawned workers start from a clean interpreter: forking a process that already holds torch or CUDA state is not safe
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(configs)), mp_context=context) as executor:
+            futures = {executor.submit(split_file, config): config.filepath for config in configs}
+            for future in as_completed(futures):
+                file = futures[future]
+                try:
+                    collect(file, *future.result())
+                except Exception as error:
+                    collect(file, [], error=error)
+
+    else:
+        for config in configs:
+            try:
+                collect(config.filepath, *split_file(config))
+            except Exception as error:
+                collect(config.filepath, [], error=error)
+
+    # Merging the logs of every file, in the order of the input folder
+    logs = []
+    failed = []
+    for file in files:
+        file_logs, error = results[file]
+        if error is not None:
+            failed.append(os.path.basename(file))
+            logs.append(f'{os.path.basename(file)} could not be split: {error}')
+        logs.extend(f'{os.path.basename(file)}: {log}' for log in file_logs)
+
+    # The metrics of the whole run are kept next to the outputs, to compare runs and machines
+    metrics.finish()
+    metrics_path = metrics.save(output_folder)
+    logs += metrics.report()
+    logs.append(f'Metrics saved to {metrics_path}')
+
+    return {'files': files, 'failed': failed, 'logs': logs, 'metrics': metrics.summary(), 'metrics_path': metrics_path}
+
+
+def split_main(filepath, time_threshold, output_folder, transcription_choice, transcription_model, silence_backend='numpy', split_mode='memory',
+               segmentation='planner', workers=1, output_mode='files', transcription_batch_size=whisper_utils.DEFAULT_BATCH_SIZE,
+               transcription_max_wait=whisper_utils.DEFAULT_MAX_WAIT, progress=None, conform=None):
     """
         Main function to split and transcribe audio files.
 
@@ -433,41 +1223,94 @@ def split_main(filepath, time_threshold, output_folder, transcription_choice, tr
             output_folder (str): The folder to save the output files.
             transcription_choice (bool): Whether to transcribe the audio or not.
             transcription_model (str): The transcription model to use.
+            silence_backend (str): The silence detection engine, 'numpy' or 'ffmpeg'.
+            split_mode (str): 'memory' to split sample-offset views of the decoded source, 'temp_files' for the original engine.
+            segmentation (str): In memory mode, 'planner' to plan all the cuts in one pass, 'recursive' to split over-long segments again.
+            workers (int): The number of files split at the same time, each in its own process.
+            output_mode (str): 'files' to write every clip, 'index' to only write a cut index of the clips, in memory mode.
+            transcription_batch_size (int): The number of clips transcribed together in memory mode, 1 to disable batching.
+            transcription_max_wait (float): The longest time a clip waits for its transcription batch to fill up, in seconds.
+            progress (callable, optional): Called with the completed fraction and a description after each file, like gr.Progress.
+            conform (conform_utils.ConformSettings, optional): The sample rate, channels and loudness the clips are conformed to before being written.
 
         Returns:
             str: A message indicating the success or failure of the operation.
     """
 
+    try:
+        result = split_files(filepath, time_threshold, output_folder, transcription_choice, transcription_model, silence_backend, split_mode,
+                             segmentation, workers, output_mode, transcription_batch_size, transcription_max_wait, progress, conform)
+    except ValueError as error:
+        return str(error)
 
-    no_silence_message = f'No silences of {time_threshold} seconds where detected. Try a shorter time period.'
-    counter = 1
-
-    files = get_files(filepath)
-
-
-    for file in files:
-
-        
-        process_config = instantiate_config(file, time_threshold, output_folder, transcription_choice, transcription_model)
+    files, failed = result['files'], result['failed']
+    if failed:
+        return f'{len(files) - len(failed)} of your {len(files)} audios were split.\n\n' + "\n".join(result['logs'])
 
-        if not os.path.exists(process_config.output_folder):
-            os.makedirs(process_config.output_folder)
+    return f'Your audios were successfully split.\n\n' + "\n".join(result['logs'])
 
-        ap = AudioProcessor(process_config)
 
-        if silence_list := ap.detect_silences(
-            process_config.filepath, process_config.time_threshold
-        ):
-            midpoints = [(start + end) / 2 for start, end in silence_list]
-            ap.split_and_transcribe_audio(midpoints, counter)
+def materialize_cut_indexes(folder, progress=None):
+    """
+        Write the clips of the cut indexes of a split made with the index output, as the files output would have written them:
+        numbered after their source, in the Usable and NonUsable folders next to each index.
 
-        else:
-            return no_silence_message
+        Args:
+            folder (str): The output folder of the split, or the folder of a single source holding its cut index.
+            progress (callable, optional): Called with the completed fraction and a description after each source, like gr.Progress.
 
-        usable_folder = os.path.join(process_config.output_folder, 'Usable')
-        non_usable_folder = os.path.join(process_config.output_folder,  'NonUsable')
-        logs = move_usable_files(process_config.output_folder, usable_folder, non_usable_folder)
+        Returns:
+            dict: The cut indexes found, the ones that failed, the number of clips written and the logs.
+    """
+    index_paths = sorted(glob.glob(os.path.join(glob.escape(folder), cut_index_utils.CUT_INDEX_NAME))
+                         + glob.glob(os.path.join(glob.escape(folder), '*', cut_index_utils.CUT_INDEX_NAME)))
+
+    metrics = metrics_utils.RunMetrics('materialize', progress, total=len(index_paths))
+    failed, logs = [], []
+    clips = 0
+
+    # One source failing, such as a source changed since its split, doesn't stop the others
+    for index_path in index_paths:
+        source_folder = os.path.dirname(index_path)
+        try:
+            cuts = cut_index_utils.CutIndex(index_path)
+            prefix = os.path.basename(cuts.source).rsplit('.', 1)[0]
+            export_format = get_export_format(cuts.source)
+
+            with metrics.stage('materialize', float(cuts.durations.sum()), len(cuts)):
+                for routing in ('Usable', 'NonUsable'):
+                    os.makedirs(os.path.join(source_folder, routing), exist_ok=True)
+
+                for index, counter in enumerate(cuts.counters):
+                    routing = 'Usable' if cuts.usable[index] else 'NonUsable'
+                    cuts.materialize(index, os.path.join(source_folder, routing, get_clip_name(prefix, int(counter), '', export_format)), export_format)
+
+            metrics.record(file=os.path.basename(cuts.source), audio_seconds=float(cuts.durations.sum()), clips=len(cuts))
+            clips += len(cuts)
+            logs.append(f'{os.path.basename(source_folder)}: {len(cuts)} clips written.')
+        except Exception as error:
+            failed.append(index_path)
+            logs.append(f'{os.path.basename(source_folder)} could not be materialized: {error}')
+        metrics.advance(f'{os.path.basename(source_folder)} ' + ('failed' if failed and failed[-1] == index_path else 'done'))
+
+    metrics.finish()
+    logs += metrics.report()
+    return {'indexes': index_paths, 'failed': failed, 'clips': clips, 'logs': logs}
+
+
+def materialize_main(folder, progress=None):
+    """
+        Write the clips of the cut indexes of a split folder, for the web UI.
 
+        Args:
+            folder (str): The output folder of the split.
+            progress (callable, optional): Called with the completed fraction and a description after each source, like gr.Progress.
 
+        Returns:
+            str: A message with the number of clips written and the logs.
+    """
+    result = materialize_cut_indexes(folder, progress)
+    if not result['indexes']:
+        return f'No {cut_index_utils.CUT_INDEX_NAME} found in {folder} or its subfolders. Split with the index output first.'
 
-    return f'Your audios were successfully split.\n\n' + "\n".join(logs)
+    return f"{result['clips']} clips were written from {len(result['indexes']) - len(result['failed'])} of your {len(result['indexes'])} cut indexes.\n\n" + "\n".join(result['logs'])
@@ -1,8 +1,10 @@
 
 import gradio as gr
-import transcribe_utils as utils
 import os
 
+# The utils of the tab are only imported when a transcription is first started: they need torch and Whisper,
+# which take seconds to import and which the other tabs never use
+
 def auto_fill_output(input_folder):
     """
         Automatically generate an output folder path based on the input folder.
@@ -35,6 +37,39 @@ def auto_fill_output(input_folder):
     return export_folder
 
 
+def choose_transcriber(transcriber_choice):
+    """
+        Toggle visibility of transcriber tools based on the user's choice.
+
+        Args:
+            transcriber_choice (str): The user's choice of transcriber ('This tool' or 'MRQ Tool').
+
+        Returns:
+            tuple: A tuple containing the visibility states of the internal transcriber group and MRQ tool group.
+    """
+        
+    if transcriber_choice == 'This tool':
+        internal_transcriber_group = gr.Group(visible=True)
+        mrq_tool_group = gr.Group(visible=False)
+    
+    else:
+        internal_transcriber_group = gr.Group(visible=False)
+        mrq_tool_group = gr.Group(visible=True)
+    
+    return internal_transcriber_group, mrq_tool_group
+
+
+def transcribe_audios(input_folder, model, export_folder, progress=gr.Progress()):
+    """
+        Transcribe the audios of the tab, reporting the progress of each audio in the interface.
+
+        Returns:
+            str: The message of transcribe_utils.internal_transcriber.
+    """
+    import transcribe_utils
+    return transcribe_utils.internal_transcriber(input_folder, model, export_folder, progress)
+
+
 def create_transcribe_audio_interface():
     """
         Create the Gradio interface for transcribing audio files.
@@ -109,7 +144,7 @@ def create_transcribe_audio_interface():
             mrq_textbox = gr.Markdown(value = instructions_text)
 
         auto_path_btn.click(fn=auto_fill_output, inputs=input_folder, outputs=export_folder)
-        choice_radio.change(fn=utils.choose_transcriber, inputs=[choice_radio], outputs=[internal_transcriber_group, mrq_tool_group])
-        submit_button.click(fn=utils.internal_transcriber, inputs=[input_folder, model_choice, export_folder], outputs=out)
+        choice_radio.change(fn=choose_transcriber, inputs=[choice_radio], outputs=[internal_transcriber_group, mrq_tool_group])
+        submit_button.click(fn=transcribe_audios, inputs=[input_folder, model_choice, export_folder], outputs=out)
 
     return interface
\ No newline at end of file
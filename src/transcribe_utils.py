@@ -1,9 +1,10 @@
-import gradio as gr
-import whisper
+import whisper_utils
+import metrics_utils
 import json
 import os
+import time
 
-def transcribe_audios(input, model, export_folder):
+def transcribe_audios(input, model, export_folder, progress=None):
     """
         Transcribe audio files in the specified input directory using the given Whisper model
         and save the transcriptions to a JSON file in the specified export folder.
@@ -12,33 +13,53 @@ def transcribe_audios(input, model, export_folder):
             input (str): The directory containing audio files to be transcribed.
             model (str): The name of the Whisper model to be used for transcription.
             export_folder (str): The directory where the transcription results will be saved.
+            progress (callable, optional): Called with the completed fraction and a description after each audio, like gr.Progress.
 
         Returns:
-            None
+            metrics_utils.RunMetrics: The metrics of the run.
     """
+    # Imported here rather than with the module, as it pulls torch in
+    import whisper
         
     extensions = ['.mp3', '.wav']
-    model = whisper.load_model(model)
+    audios = [audio for audio in os.listdir(input) if any(audio.endswith(ext) for ext in extensions)]
+    metrics = metrics_utils.RunMetrics('transcribe', progress, total=len(audios))
+
+    with metrics.stage('load_model'):
+        model = whisper_utils.get_model(model)
     export_path = os.path.join(export_folder, 'whisper.json')
 
     os.makedirs(export_folder, exist_ok=True)
     
     transcriptions = {}
 
-    for audio in os.listdir(input):
-        if any(audio.endswith(ext) for ext in extensions):
-            audio_path = os.path.join(input, audio)  
-            result = model.transcribe(audio_path)
-            transcriptions[audio] = result
+    for audio in audios:
+        audio_path = os.path.join(input, audio)
+
+        # Decoding separately from the transcription, to tell the time spent in ffmpeg from the time spent in Whisper
+        started = time.monotonic()
+        samples = whisper.load_audio(audio_path)
+        duration = len(samples) / whisper.audio.SAMPLE_RATE
+        metrics.add('decode', time.monotonic() - started, duration, 1)
+
+        with metrics.stage('transcribe', duration):
+            result = model.transcribe(samples)
+        transcriptions[audio] = result
+
+        metrics.record(file=audio, audio_seconds=duration)
+        metrics.advance(f'{audio} transcribed')
 
     # Write to a JSON file
-    with open(export_path, 'w') as json_file:
-        json.dump(transcriptions, json_file, indent=4, sort_keys=True)
-    
+    with metrics.stage('write', items=len(transcriptions)):
+        with open(export_path, 'w') as json_file:
+            json.dump(transcriptions, json_file, indent=4, sort_keys=True)
+
+    metrics.finish()
+    return metrics
     
 
 
-def internal_transcriber(input, model, export_path):
+def internal_transcriber(input, model, export_path, progress=None):
     """
         Transcribe audio files using the internal transcriber and save the results.
 
@@ -46,32 +67,13 @@ def internal_transcriber(input, model, export_path):
             input (str): The directory containing audio files to be transcribed.
             model (str): The name of the Whisper model to be used for transcription.
             export_path (str): The directory where the transcription results will be saved.
+            progress (callable, optional): Called with the completed fraction and a description after each audio, like gr.Progress.
 
         Returns:
             str: A message indicating the success of the transcription process.
     """
 
-    transcribe_audios(input, model, export_path)
-    
-    return 'Your audios have been successfully transcribed.'
-
-def choose_transcriber(transcriber_choice):
-    """
-        Toggle visibility of transcriber tools based on the user's choice.
-
-        Args:
-            transcriber_choice (str): The user's choice of transcriber ('This tool' or 'MRQ Tool').
-
-        Returns:
-            tuple: A tuple containing the visibility states of the internal transcriber group and MRQ tool group.
-    """
-        
-    if transcriber_choice == 'This tool':
-        internal_transcriber_group = gr.Group(visible=True)
-        mrq_tool_group = gr.Group(visible=False)
-    
-    else:
-        internal_transcriber_group = gr.Group(visible=False)
-        mrq_tool_group = gr.Group(visible=True)
+    metrics = transcribe_audios(input, model, export_path, progress)
+    logs = metrics.report() + [f'Metrics saved to {metrics.save(export_path)}']
     
-    return internal_transcriber_group, mrq_tool_group
\ No newline at end of file
+    return 'Your audios have been successfully transcribed.\n\n' + "\n".join(logs)
@@ -0,0 +1,179 @@
+import os
+import threading
+from collections import OrderedDict
+
+# torch and whisper take seconds to import: they are only imported in the functions needing them,
+# so that splitting or converting without transcription never loads them.
+
+
+# Default memory the loaded models may take together, in megabytes. Can be overridden with ADM_WHISPER_MEMORY_MB.
+DEFAULT_MEMORY_CAP_MB = 4096
+
+# Default number of clips transcribed together, and default time to wait for a batch to fill up, in seconds
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_MAX_WAIT = 2.0
+
+
+class WhisperModelRegistry():
+    """
+        Class to share loaded Whisper models across the whole process, keyed by model name, device and dtype.
+        The least recently used models are evicted when the loaded models exceed the memory cap.
+    """
+
+    def __init__(self, memory_cap_mb=DEFAULT_MEMORY_CAP_MB):
+        """
+            Initialize an empty registry.
+
+            Args:
+                memory_cap_mb (float): The memory the loaded models may take together, in megabytes.
+        """
+        self.memory_cap_mb = memory_cap_mb
+        self.models = OrderedDict()
+        self.sizes_mb = {}
+        self.lock = threading.Lock()
+
+    def get_key(self, name, device=None, dtype=None):
+        """
+            Build the registry key of a model, resolving the default device and dtype.
+
+            Args:
+                name (str): The name of the Whisper model.
+                device (str, optional): The device to load the model on. Defaults to cuda when available.
+                dtype (str, optional): 'float32' or 'float16'. Defaults to float16 on cuda and float32 on cpu.
+
+            Returns:
+                tuple: The (name, device, dtype) key.
+        """
+        import torch
+
+        device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        dtype = dtype or ("float16" if device.startswith("cuda") else "float32")
+        return name, device, dtype
+
+    def get_model(self, name, device=None, dtype=None):
+        """
+            Get a Whisper model, loading it only if it is not in the registry yet.
+
+            Args:
+                name (str): The name of the Whisper model.
+                device (str, optional): The device to load the model on.
+                dtype (str, optional): 'float32' or 'float16'.
+
+            Returns:
+                whisper.model.Whisper: The loaded model.
+        """
+        key = self.get_key(name, device, dtype)
+
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                return self.models[key]
+
+            import whisper
+
+            model_name, model_device, model_dtype = key
+            print(f'Loading Whisper model {model_name} on {model_device} ({model_dtype})')
+            model = whisper.load_model(model_name, device=model_device)
+            if model_dtype == "float16":
+                model = model.half()
+
+            self.models[key] = model
+            self.sizes_mb[key] = sum(param.numel() * param.element_size() for param in model.parameters()) / 2**20
+            self.evict()
+
+            return model
+
+    def evict(self):
+        """
+            Drop the least recently used models until the loaded models fit in the memory cap.
+            The most recent model is always kept, even if it is larger than the cap on its own.
+        """
+        while len(self.models) > 1 and sum(self.sizes_mb.values()) > self.memory_cap_mb:
+            key, _ = self.models.popitem(last=False)
+            del self.sizes_mb[key]
+            print(f'Evicted Whisper model {key[0]} ({key[1]}, {key[2]}) from the registry')
+
+            # Giving the memory of the evicted model back to the GPU
+            if key[1].startswith("cuda"):
+                import torch
+                torch.cuda.empty_cache()
+
+    def preload(self, names, device=None, dtype=None):
+        """
+            Load models ahead of time, so that the first transcription doesn't pay for it.
+
+            Args:
+                names (list): The names of the Whisper models to load.
+                device (str, optional): The device to load the models on.
+                dtype (str, optional): 'float32' or 'float16'.
+        """
+        for name in names:
+            self.get_model(name, device, dtype)
+
+    def clear(self):
+        """
+            Unload every model of the registry.
+        """
+        with self.lock:
+            self.models.clear()
+            self.sizes_mb.clear()
+
+
+# The registry shared by every tab of the application
+registry = WhisperModelRegistry(float(os.environ.get('ADM_WHISPER_MEMORY_MB', DEFAULT_MEMORY_CAP_MB)))
+
+
+def get_model(name, device=None, dtype=None):
+    """
+        Get a Whisper model from the shared registry.
+
+        Args:
+            name (str): The name of the Whisper model.
+            device (str, optional): The device to load the model on.
+            dtype (str, optional): 'float32' or 'float16'.
+
+        Returns:
+            whisper.model.Whisper: The loaded model.
+    """
+    return registry.get_model(name, device, dtype)
+
+
+def transcribe_batch(model, audios):
+    """
+        Transcribe several short clips with a single encoder and decoder pass.
+        Clips longer than Whisper's 30 seconds window would be cut by the batch, they are transcribed one by one with its
+        long-form segmentation instead.
+
+        Args:
+            model (whisper.model.Whisper): The loaded model.
+            audios (list): The clips, as 16 kHz mono float32 arrays.
+
+        Returns:
+            list: The transcribed text of each clip, in the same order.
+    """
+    import torch
+    import whisper
+
+    fp16 = model.device.type == "cuda"
+    texts = [None] * len(audios)
+
+    short = []
+    for index, audio in enumerate(audios):
+        if len(audio) > whisper.audio.N_SAMPLES:
+            texts[index] = model.transcribe(audio, fp16=fp16)["text"]
+        else:
+            short.append(index)
+
+    if short:
+        # Each clip is padded to the 30 seconds window, so that all the spectrograms have the same shape and can be stacked
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audios[index])), n_mels=model.dims.n_mels)
+            for index in short
+        ]).to(model.device)
+
+        options = whisper.DecodingOptions(fp16=fp16, without_timestamps=True)
+        results = whisper.decode(model, mels, options)
+        for index, result in zip(short, results):
+            texts[index] = result.text
+
+    return texts
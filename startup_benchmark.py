@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+src_folder = os.path.join(current_dir, 'src')
+
+
+# Modules worth knowing about when they get imported, as each takes a noticeable time
+HEAVY_MODULES = ['torch', 'whisper', 'gradio', 'numpy', 'pydub']
+
+# What is measured, each time in a fresh interpreter: the startup of the app and of the command line,
+# the utils of each tab, and the heavy dependencies on their own
+TARGETS = {
+    'web UI (build every tab)': 'import webui_main; webui_main.create_interface()',
+    'command line': 'import cli_main; cli_main.build_parser()',
+    'split_utils': 'import split_utils',
+    'analyze_utils': 'import analyze_utils',
+    'transcribe_utils': 'import transcribe_utils',
+    'fix_transcription_utils': 'import fix_transcription_utils',
+    'gradio': 'import gradio',
+    'torch': 'import torch',
+    'whisper': 'import whisper',
+}
+
+# Run in the fresh interpreter: times the statement and lists the heavy modules it imported
+CHILD_CODE = '''
+import json, sys, time
+sys.path[:0] = {paths!r}
+started = time.perf_counter()
+exec({statement!r})
+seconds = time.perf_counter() - started
+print(json.dumps({{'seconds': seconds, 'imported': [name for name in {heavy!r} if name in sys.modules]}}))
+'''
+
+
+def measure(statement, repeat=3):
+    """
+        Time a statement in fresh interpreters, so that nothing is already imported.
+
+        Args:
+            statement (str): The Python code to time.
+            repeat (int): The number of interpreters to run it in. The median is kept.
+
+        Returns:
+            dict: The median seconds spent in the statement and in the whole interpreter, and the heavy modules it imported.
+                  Holds an error instead if the statement failed, such as an optional dependency not being installed.
+    """
+    code = CHILD_CODE.format(paths=[current_dir, src_folder], statement=statement, heavy=HEAVY_MODULES)
+    import_seconds, process_seconds = [], []
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', code], cwd=current_dir, capture_output=True, text=True)
+        process_seconds.append(time.perf_counter() - started)
+
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()
+            return {'error': error[-1] if error else f'exited with code {result.returncode}'}
+
+        output = json.loads(result.stdout.strip().splitlines()[-1])
+        import_seconds.append(output['seconds'])
+
+    return {
+        'seconds': statistics.median(import_seconds),
+        'process_seconds': statistics.median(process_seconds),
+        'imported': output['imported'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the import and startup time of the app, of its tabs and of its heavy dependencies.')
+    parser.add_argument('--repeat', type=int, default=3, help='The number of fresh interpreters each target is timed in.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    parser.add_argument('targets', nargs='*', help=f'The targets to measure, all of them by default: {", ".join(TARGETS)}.')
+    args = parser.parse_args()
+
+    if unknown := [name for name in args.targets if name not in TARGETS]:
+        parser.error(f'unknown targets: {", ".join(unknown)}')
+
+    results = {name: measure(TARGETS[name], args.repeat) for name in (args.targets or TARGETS)}
+
+    if args.json:
+        print(json.dumps(results, indent=4))
+        return
+
+    for name, result in results.items():
+        if 'error' in result:
+            print(f'{name:<28} failed: {result["error"]}')
+        else:
+            imported = ', '.join(result['imported']) or 'none'
+            print(f'{name:<28} {result["seconds"]:7.2f}s  ({result["process_seconds"]:.2f}s with the interpreter)  heavy modules: {imported}')
+
+
+if __name__ == '__main__':
+    main()
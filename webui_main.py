@@ -1,4 +1,3 @@
-import gradio as gr
 import sys
 import os
 
@@ -6,31 +5,43 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 src_folder = os.path.join(current_dir, 'src')
 sys.path.append(src_folder)
 
+import whisper_utils
 
-from readme_ui import create_readme_interface
-from analyze_ui import create_analyze_audio_interface
-from split_ui import create_split_audio_interface
-from transcribe_ui import create_transcribe_audio_interface
-from fix_transcription_ui import create_fix_transcription_interface
 
+def create_interface():
+    """
+        Build the tabs of the application. Gradio and the tabs are imported here rather than with the module:
+        the split workers re-import this module when they start, and must not pay for them.
+        Each tab imports its own utils only when it is first used.
 
-readme_ui = create_readme_interface()
-analyze_audio_ui = create_analyze_audio_interface()
-split_audio_ui = create_split_audio_interface()
-transcribe_audio_ui = create_transcribe_audio_interface()
-fix_transcription_ui = create_fix_transcription_interface()
+        Returns:
+            gr.TabbedInterface: The application, ready to launch.
+    """
+    import gradio as gr
+    from readme_ui import create_readme_interface
+    from analyze_ui import create_analyze_audio_interface
+    from split_ui import create_split_audio_interface
+    from transcribe_ui import create_transcribe_audio_interface
+    from fix_transcription_ui import create_fix_transcription_interface
 
-interfaces = [readme_ui, analyze_audio_ui, split_audio_ui, transcribe_audio_ui, fix_transcription_ui]
-tab_names = ["Readme", "Analyze audio", "Split audio", "Transcribe audio", "Fix transcription"]
+    readme_ui = create_readme_interface()
+    analyze_audio_ui = create_analyze_audio_interface()
+    split_audio_ui = create_split_audio_interface()
+    transcribe_audio_ui = create_transcribe_audio_interface()
+    fix_transcription_ui = create_fix_transcription_interface()
 
-tabbed_interface = gr.TabbedInterface(interface_list=interfaces, tab_names=tab_names)
+    interfaces = [readme_ui, analyze_audio_ui, split_audio_ui, transcribe_audio_ui, fix_transcription_ui]
+    tab_names = ["Readme", "Analyze audio", "Split audio", "Transcribe audio", "Fix transcription"]
 
+    return gr.TabbedInterface(interface_list=interfaces, tab_names=tab_names)
 
-tabbed_interface.launch()
 
+# The split tab can spawn worker processes, which re-import this module: only the main process loads models and launches the app
+if __name__ == '__main__':
 
+    # Optionally load Whisper models before the first click, for example ADM_WHISPER_PRELOAD="base,small"
+    if preload_models := os.environ.get('ADM_WHISPER_PRELOAD'):
+        whisper_utils.registry.preload([name.strip() for name in preload_models.split(',') if name.strip()])
 
-
-        
-    
-        
+    tabbed_interface = create_interface()
+    tabbed_interface.launch()